@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark every solver and the hot functions inside them, and compare with a stored baseline.
+
+    ./bench.py --save           # measure and write the baseline
+    ./bench.py                  # measure and fail if anything regressed
+    ./bench.py --small          # same, on the puzzle examples
+    ./bench.py day12 day14      # only the cases of those modules
+
+Each case is run --repeat times and the best wall time is kept, then once more
+under tracemalloc for the peak memory. A case regresses when its time is more than
+--time-threshold above the baseline, or its peak memory more than --memory-threshold above.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from itertools import combinations
+from typing import Callable, List, Set, Tuple, Collection, Dict
+
+import run
+from reader import read_lines, read_chunks
+
+BASELINE_FILE = "bench_baseline.json"
+
+
+def read(filename) -> str:
+    with open(filename, "r") as f:
+        return f.read().strip()
+
+
+# Hot functions. Each setup reads its input and returns the thunk to time,
+# it's called again before every repetition since some of them mutate their input.
+
+def setup_possible_arrangements(filename) -> Callable:
+    import day12
+    records = list(day12.parse(read_lines(filename)))
+    return lambda: sum(day12.possible_arrangements(r) for r in records)
+
+
+def setup_bit_record_count(filename) -> Callable:
+    import day12
+    records = [day12.BitRecord.from_record(r) for r in day12.parse(read_lines(filename))]
+    return lambda: sum(r.count() for r in records)
+
+
+# Copies of a record are unfolded this many times, where the matrices should win
+UNFOLD = 500
+# The groups done by a copy vary with the way through it, the matrices fall back
+# to count_arrangements on these, both should be about the same
+VARIABLE_RECORDS = ["?#.??#?? 1,1,1,1", "...#.???.?.??.?.# 1,1,1,1", "?#??.??#?.??? 2,1,3"]
+UNFOLD_VARIABLE = 100
+
+
+def unfolded_thunk(records, k: int) -> Callable:
+    import day12
+    return lambda: sum(day12.unfolded_arrangements(r.record, r.groups, [k])[0] for r in records)
+
+
+def unfolded_count_thunk(records, k: int) -> Callable:
+    import day12
+    return lambda: sum(day12.count_arrangements("?".join([r.record] * k), r.groups * k) for r in records)
+
+
+def setup_unfolded_arrangements(filename) -> Callable:
+    import day12
+    return unfolded_thunk(list(day12.parse(read_lines(filename))), UNFOLD)
+
+
+def setup_unfolded_count(filename) -> Callable:
+    import day12
+    return unfolded_count_thunk(list(day12.parse(read_lines(filename))), UNFOLD)
+
+
+def setup_unfolded_arrangements_variable(filename) -> Callable:
+    import day12
+    return unfolded_thunk(list(day12.parse(VARIABLE_RECORDS)), UNFOLD_VARIABLE)
+
+
+def setup_unfolded_count_variable(filename) -> Callable:
+    import day12
+    return unfolded_count_thunk(list(day12.parse(VARIABLE_RECORDS)), UNFOLD_VARIABLE)
+
+
+def setup_load_at_cycle_prediction(filename) -> Callable:
+    import day14
+    rocks = day14.parse_rocks(read(filename))
+    return lambda: day14.load_at_cycle_prediction(rocks, 10**9)
+
+
+def setup_count_energized(filename) -> Callable:
+    import day16
+    grid = day16.parse(read(filename))
+    start_beam = day16.Beam(direction=day16.Direction.RIGHT, x=0, y=0)
+    return lambda: day16.count_energized(grid, start_beam)
+
+
+def setup_find_expanded_distance(filename) -> Callable:
+    import day11
+    grid = day11.parse(read(filename))
+    galaxies = day11.find_galaxies(grid)
+    exp_fac = day11.find_expansion_factor(grid)
+    return lambda: sum(day11.find_expanded_distance(g1, g2, exp_fac, 1000000)
+                       for g1, g2 in combinations(galaxies, 2))
+
+
+def setup_map_apply(filename) -> Callable:
+    import day05
+    seeds, list_of_maps = day05.parse(read_chunks(filename))
+
+    def apply_all():
+        s = seeds
+        for m in list_of_maps:
+            s = [m.apply(i) for i in s]
+        return min(s)
+    return apply_all
+
+
+def setup_lockstep(filename) -> Callable:
+    import day08
+    direction, m = day08.parse(read_lines(filename))
+    graph = day08.CompiledGraph.compile(direction, m)
+    starts = [graph.ids[k] for k in m if k[-1] == "A"]
+    # never all on a Z this early with the real inputs, so all the steps are timed
+    return lambda: day08.lockstep(graph, starts, graph.mask("Z"), 100000)
+
+
+HOT_FUNCTIONS = {
+    "day12.possible_arrangements": ("day12", setup_possible_arrangements),
+    "day12.BitRecord.count": ("day12", setup_bit_record_count),
+    "day12.unfolded_arrangements": ("day12", setup_unfolded_arrangements),
+    "day12.count_arrangements_unfolded": ("day12", setup_unfolded_count),
+    "day12.unfolded_arrangements_variable": ("day12", setup_unfolded_arrangements_variable),
+    "day12.count_arrangements_unfolded_variable": ("day12", setup_unfolded_count_variable),
+    "day14.load_at_cycle_prediction": ("day14", setup_load_at_cycle_prediction),
+    "day16.count_energized": ("day16", setup_count_energized),
+    "day11.find_expanded_distance": ("day11", setup_find_expanded_distance),
+    "day05.Map.apply": ("day05", setup_map_apply),
+    "day08.lockstep": ("day08", setup_lockstep),
+}
+
+
+@dataclass
+class Case:
+    name: str
+    filename: str
+    setup: Callable
+
+
+@dataclass
+class Measure:
+    time: float
+    peak_memory: int
+
+
+def make_cases(modules, small, input_dir) -> List[Case]:
+    cases = []
+    for job in run.make_jobs(modules, small, input_dir):
+        solver = getattr(importlib.import_module(job.module), job.solver)
+        setup = lambda filename, solver=solver, kwargs=job.kwargs: (lambda: solver(filename, **kwargs))
+        cases.append(Case(job.name, job.filename, setup))
+
+    for name, (day, setup) in HOT_FUNCTIONS.items():
+        if day in modules:
+            cases.append(Case(name, run.input_file(day, small, input_dir), setup))
+    return cases
+
+
+def measure(case: Case, repeat: int) -> Measure:
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        best = None
+        for _ in range(repeat):
+            thunk = case.setup(case.filename)
+            start = time.perf_counter()
+            thunk()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        thunk = case.setup(case.filename)
+        tracemalloc.start()
+        try:
+            thunk()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return Measure(best, peak)
+
+
+def load_baseline(filename) -> Dict[str, Measure]:
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, "r") as f:
+        return {name: Measure(**m) for name, m in json.load(f).items()}
+
+
+def save_baseline(filename, measures: Dict[str, Measure]):
+    baseline = load_baseline(filename)
+    baseline.update(measures)
+    with open(filename, "w") as f:
+        json.dump({name: asdict(m) for name, m in sorted(baseline.items())}, f, indent=2)
+
+
+def compare(measures: Dict[str, Measure], baseline: Dict[str, Measure],
+            time_threshold: float, memory_threshold: float) -> List[str]:
+    "Print the comparison, return the names of the regressed cases"
+    width = max([len(n) for n in measures] + [len("case")])
+    print(f"{'case':<{width}}  {'time (s)':>9}  {'baseline':>9}  {'peak (KiB)':>10}  {'baseline':>10}")
+    regressions = []
+    for name, m in measures.items():
+        b = baseline.get(name)
+        b_time = f"{b.time:9.4f}" if b else f"{'-':>9}"
+        b_peak = f"{b.peak_memory // 1024:10}" if b else f"{'-':>10}"
+        status = ""
+        if b and m.time > b.time * (1 + time_threshold):
+            status += " TIME REGRESSION"
+        if b and m.peak_memory > b.peak_memory * (1 + memory_threshold):
+            status += " MEMORY REGRESSION"
+        if status:
+            regressions.append(name)
+        print(f"{name:<{width}}  {m.time:9.4f}  {b_time}  {m.peak_memory // 1024:10}  {b_peak}{status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the advent of code solvers")
+    parser.add_argument("modules", nargs="*", help="modules to benchmark (default: all)")
+    parser.add_argument("--small", action="store_true", help="benchmark on the examples")
+    parser.add_argument("--input-dir", default=".", help="where the dayXX.txt files are")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="write the measures to the baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case, the best is kept")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--memory-threshold", type=float, default=0.10, help="allowed peak memory increase")
+    args = parser.parse_args()
+
+    modules = args.modules or run.find_modules()
+    measures = {}
+    failed = {}
+    for case in make_cases(modules, args.small, args.input_dir):
+        if not os.path.exists(case.filename):
+            print(f"Skipping {case.name}, missing input {case.filename}")
+            continue
+        # same as run.run_job, a failing case doesn't stop the others
+        try:
+            measures[case.name] = measure(case, args.repeat)
+        except Exception as e:
+            failed[case.name] = f"{type(e).__name__}: {e}"
+
+    regressions = compare(measures, load_baseline(args.baseline), args.time_threshold, args.memory_threshold)
+    for name, error in failed.items():
+        print(f"{name} FAILED: {error}")
+    if args.save:
+        save_baseline(args.baseline, measures)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+    if failed:
+        print(f"{len(failed)} failed: {', '.join(failed)}")
+    if failed or (regressions and not args.save):
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@
 from dataclasses import dataclass
 from typing import List, Tuple
 
+import tracing
+from reader import read_lines
+
 @dataclass
 class CubeSet:
     red: int
@@ -60,27 +63,26 @@ def parse_bag(bags) -> List[CubeSet]:
 
 
 def day02(filename, expected=None):
-    with open(filename, "r") as f:
-        lines = f.read().split("\n")
-    lines: List[str] = list(filter(None,lines))
-    games = []
-    
-    for l in lines:
-        game = parse(l)
-        games.append(game)
-    
-    print(games)
-
     bag = CubeSet(red=12, blue=14, green=13)
 
-    id_sum = sum([g.id for g in games if g.possible_cube_set(bag)])
-    power_sum = sum([g.power() for g in games ])
+    games = 0
+    id_sum = 0
+    power_sum = 0
+    for l in read_lines(filename):
+        game = parse(l)
+        games += 1
+        if game.possible_cube_set(bag):
+            id_sum += game.id
+        power_sum += game.power()
+
+    tracing.count("day02.games", games)
 
     if expected:
         assert(expected == id_sum)
 
     print(id_sum)
     print(power_sum)
+    return id_sum, power_sum
 
 
 if __name__ == "__main__":
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
 
 from typing import List, Set, Tuple, Collection, Dict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from itertools import chain
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+import piecewise
+import tracing
+from rangeset import RangeSet
+from reader import read_chunks
 
 
 @dataclass
@@ -12,7 +19,7 @@ class Mapping:
     range_len: int
 
     def inside(self, input):
-        return input in range(self.source, self.source + self.range_len)
+        return self.source <= input < self.source + self.range_len
 
     def apply(self, input):
         return input - self.source + self.dest
@@ -46,7 +53,6 @@ class RangeMap:
         A RangeMap applying another will result in 1 or more RangeMap.
         The part r not covered by the self rangeMap is not returned
         """
-        print("Apply:", self, r)
         # no overlap, no changes
         if r.end < self.start or r.start > self.end:
             return [self]
@@ -90,12 +96,56 @@ class RangeMap:
 class Map:
     name: str
     mappings: List[Mapping]
+    # Interval index, built once from the mappings, see piecewise.
+    # Piece k covers [bounds[k-1], bounds[k]) and shifts by offsets[k],
+    # the gaps between mappings are pieces with an offset of 0.
+    bounds: List[int] = field(init=False, repr=False)
+    offsets: List[int] = field(init=False, repr=False)
+    # Built on the first reverse query
+    inverse: Optional[piecewise.Inverse] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        self.bounds, self.offsets = piecewise.from_intervals(
+            (m.source, m.source + m.range_len, m.offset()) for m in self.mappings
+        )
+
+    @staticmethod
+    def from_pieces(name, pieces: piecewise.Pieces) -> "Map":
+        mappings = [Mapping(dest=start + offset, source=start, range_len=end - start)
+                    for start, end, offset in piecewise.to_intervals(pieces)]
+        return Map(name, mappings)
+
+    def pieces(self) -> piecewise.Pieces:
+        return self.bounds, self.offsets
 
     def apply(self, i: int) -> int:
-        for m in self.mappings:
-            if m.inside(i):
-                return m.apply(i)
-        return i
+        return i + self.offsets[bisect_right(self.bounds, i)]
+
+    def apply_all(self, seeds: List[int]) -> List[int]:
+        "apply on a whole list at once"
+        bounds = self.bounds
+        offsets = self.offsets
+        return [s + offsets[bisect_right(bounds, s)] for s in seeds]
+
+    def min_apply(self, start: int, length: int) -> int:
+        "Smallest result for the seeds start to start + length - 1"
+        return piecewise.min_over(self.pieces(), start, start + length)
+
+    def preimage(self, start: int, length: int) -> RangeSet:
+        "Every input giving a result between start and start + length - 1"
+        if self.inverse is None:
+            self.inverse = piecewise.invert(self.pieces())
+        return RangeSet(piecewise.preimage(self.inverse, start, start + length))
+
+    def preimages(self, windows: Iterable[Tuple[int, int]]) -> List[RangeSet]:
+        "preimage of many (start, length) windows, sharing the inverted index"
+        return [self.preimage(start, length) for start, length in windows]
+
+
+def compose(maps: List[Map]) -> Map:
+    "The chain of maps as a single map, applying the first one first"
+    pieces = piecewise.compose_all(m.pieces() for m in maps)
+    return Map.from_pieces(f"{maps[0].name} .. {maps[-1].name}", pieces)
 
 
 def parse_seeds(seeds_data) -> List[int]:
@@ -119,12 +169,12 @@ def parse_map(map_data) -> Map:
     return Map(name, mappings)
 
 
-def parse(data) -> List[List[Mapping]]:
-    chunks = data.split("\n\n")
-    seeds = parse_seeds(chunks[0])
-    map_data = chunks[1:]
+def parse(chunks) -> Tuple[List[int], List[Map]]:
+    "Takes the blocks of the input, as from read_chunks"
+    chunks = iter(chunks)
+    seeds = parse_seeds(next(chunks))
     l = []
-    for map in map_data:
+    for map in chunks:
         l.append(parse_map(map))
 
     return seeds, l
@@ -136,34 +186,36 @@ def parse(data) -> List[List[Mapping]]:
 
 
 def day05(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    seeds, list_of_maps = parse(data)
+    seeds, list_of_maps = parse(read_chunks(filename))
 
-    print(seeds)
+    tracing.count("day05.seeds", len(seeds))
 
     for m in list_of_maps:
-        # print(m)
-        seeds = [m.apply(s) for s in seeds]
-        # print(seeds)
+        seeds = m.apply_all(seeds)
 
     result = min(seeds)
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
     print(f"Result = {result}")
+    return result
+
+def seeds_in_locations(filename, windows: Iterable[Tuple[int, int]]) -> List[RangeSet]:
+    "For each (start, length) location window, the seeds of the part 2 ranges landing in it"
+    seeds, list_of_maps = parse(read_chunks(filename))
+    seed_ranges = RangeSet((start, start + length) for start, length in zip(seeds[::2], seeds[1::2]))
+    seed_to_location = compose(list_of_maps)
+    return [r & seed_ranges for r in seed_to_location.preimages(windows)]
 
 def parse_seeds_part2(seeds_data) -> List[RangeMap]:
     seeds = seeds_data.split(":")[1].strip().split()
     r = zip(seeds[::2], seeds[1::2])
     return [(RangeMap(int(s[0]), int(s[0]) + int(s[1]) - 1, offset=0)) for s in r]
 
-def parse_part2(data):
-    chunks = data.split("\n\n")
-    seeds = parse_seeds_part2(chunks[0])
-    map_data = chunks[1:]
+def parse_part2(chunks):
+    chunks = iter(chunks)
+    seeds = parse_seeds_part2(next(chunks))
     l = []
-    for map in map_data:
+    for map in chunks:
         l.append([m.to_range_map() for m in parse_map(map).mappings])
 
     return seeds, l
@@ -173,61 +225,50 @@ def parse_part2(data):
 
 
 def day05_part2(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    seeds, range_maps = parse_part2(data)
-
-    print("Range Maps: \n", range_maps)
-
-    for i, ranges in enumerate(range_maps):
-        new_ranges = set()
-        print(f"range {i}: {ranges}")
-        for s in seeds:
-            print("Seeds with offsets\n", seeds)
-            for r in ranges:
-                print("with range r\n", r)
-                new_offsets = s.apply(r)
-                if new_offsets[0] == s:
-                    # Nothing changed, not the matching range
-                    continue
-                print("new offsets \n", new_offsets)
-                new_ranges = new_ranges | set(new_offsets)
-                break
-                # nothing matched, keep seed for next round
-            else:
-                new_ranges.add(s)
-        seeds = new_ranges
-        print("After\n", seeds)
-
-
-        
-
-        
-
-    print(f"Smallest location {min([s.start + s.offset for s in seeds])}")
-    lowest_location = min([s.start + s.offset for s in seeds])
-    #_, location_range = min([(s.offset, s) for s in seeds])
-
+    seeds, list_of_maps = parse(read_chunks(filename))
 
-    #print(location_range)
+    with tracing.span("day05_part2.compose", maps=len(list_of_maps)) as span:
+        seed_to_location = compose(list_of_maps)
+        span["mappings"] = len(seed_to_location.mappings)
 
+    # The seeds are pairs of start and length
+    lowest_location = min(seed_to_location.min_apply(start, length)
+                          for start, length in zip(seeds[::2], seeds[1::2]))
 
     result = lowest_location
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
     print(f"Result = {result}")
+    return result
+
+def check_preimage(filename):
+    "Reverse queries on the example, the seeds 79, 14, 55 and 13 are at the locations 82, 43, 86 and 35"
+    seeds, list_of_maps = parse(read_chunks(filename))
+    seed_to_location = compose(list_of_maps)
+    for seed, location in [(79, 82), (14, 43), (55, 86), (13, 35)]:
+        assert seed_to_location.apply(seed) == location
+        assert seed in seed_to_location.preimage(location, 1), (seed, location)
+    # every seed of a window lands in it, and only those
+    for start, length in [(0, 60), (40, 10), (82, 1)]:
+        preimage = seed_to_location.preimage(start, length)
+        for seed in range(200):
+            assert (seed in preimage) == (start <= seed_to_location.apply(seed) < start + length), (seed, start, length)
+    assert seed_to_location.preimages([(82, 1), (0, 60)]) == [seed_to_location.preimage(82, 1), seed_to_location.preimage(0, 60)]
+    # the lowest location of part 2 comes from the seed 82
+    assert seeds_in_locations(filename, [(46, 1)]) == [RangeSet([(82, 83)])]
 
 if __name__ == "__main__":
     #day05("day05_small.txt", expected=35)
     #day05("day05.txt")
     day05_part2("day05_small.txt", expected=46)
+    check_preimage("day05_small.txt")
     day05_part2("day05.txt")
 
 
 # After trying to list all the elements in the ranges, I'm thinking about an alternative approach.
 # Applying many Map object is equivalent to a single "Map", with more mappings. 
 # It should be efficient to find the lowest resutl based on that Map
+# Edit: That's what compose does now, and the lowest location only needs the breakpoints.
 
 
 # Part 2 a while after
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 
-from typing import List, Set, Tuple, Collection, Dict
+from typing import Iterable, List, Set, Tuple, Collection, Dict
 from dataclasses import dataclass
 
+import piecewise
+import tracing
+from rangeset import RangeSet
+from reader import read_chunks
+
 @dataclass(frozen=True, order=True)
 class Range:
     start: int
@@ -70,11 +75,56 @@ class Map:
     name: str
     mappings: List[Mapping]
 
-def parse(data, seed_func):
-    chunks = data.split("\n\n")
-    seeds_data = chunks[0]
+    def pieces(self) -> piecewise.Pieces:
+        return piecewise.from_intervals((m.start, m.end + 1, m.offset) for m in self.mappings)
+
+
+def compose(maps: List[Map]) -> Map:
+    "The chain of maps as a single map, applying the first one first"
+    pieces = piecewise.compose_all(m.pieces() for m in maps)
+    mappings = [Mapping(start, end - 1, offset) for start, end, offset in piecewise.to_intervals(pieces)]
+    return Map(f"{maps[0].name}..{maps[-1].name}", mappings)
+
+
+def to_range_set(ranges: Iterable[Range]) -> RangeSet:
+    return RangeSet((r.start, r.end + 1) for r in ranges)
+
+def apply_layer(ranges: RangeSet, map: Map) -> RangeSet:
+    """
+    Apply every mapping of the map on every range, in one sweep over both sorted by start.
+    The parts of a range not covered by a mapping are kept as they are, and the
+    pieces landing on or next to each other are merged back.
+    """
+    mappings = sorted(map.mappings, key=lambda m: m.start)
+    new_ranges = []
+    j = 0
+    for start, end in ranges:
+        # mappings ending before this range end before all the next ones too
+        while j < len(mappings) and mappings[j].end < start:
+            j += 1
+        pos = start
+        k = j
+        while k < len(mappings) and mappings[k].start < end:
+            m = mappings[k]
+            if m.start > pos:
+                new_ranges.append((pos, m.start)) # Unmodified
+            stop = min(end, m.end + 1)
+            new_ranges.append((max(pos, m.start) + m.offset, stop + m.offset))
+            pos = stop
+            if pos >= end:
+                break
+            k += 1
+        if pos < end:
+            new_ranges.append((pos, end)) # Unmodified
+    return RangeSet(new_ranges)
+
+
+def parse(chunks, seed_func):
+    "Takes the blocks of the input, as from read_chunks"
+    chunks = iter(chunks)
+    seeds_data = next(chunks)
     seeds = seed_func(seeds_data)
-    maps = parse_maps(chunks[1:])
+    maps = parse_maps(chunks)
     return seeds, maps
 
 def parse_maps(data) -> List[Map]:
@@ -109,65 +159,52 @@ def seeds_part2(data) -> List[Range]:
 
 
 def day05(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    seeds, maps = parse(data, seeds_part1)
-    print(f"Seeds: {sorted(seeds)},\n maps {maps}")
+    seeds, maps = parse(read_chunks(filename), seeds_part1)
+    tracing.count("day05.seeds", len(seeds))
 
-    current_ranges = seeds
+    current_ranges = to_range_set(seeds)
     for map in maps:
         # Apply a set of mapping to get a new set of ranges
-        new_ranges = set()
-        print(f"Processing {map.name} mappings")
-        for c_r in current_ranges:
-            for mapping in map.mappings:
-                ranges = mapping.apply(c_r)
-                new_ranges = new_ranges | set(ranges)
-                if ranges:
-                    # a mapping was found, exit
-                    break
-            else:
-                # if no mappings is applied, keep current range in set
-                new_ranges.add(c_r)
-        print(f"New ranges: {sorted(new_ranges)}")
-        current_ranges = new_ranges
-
-    result = sorted(new_ranges)[0].start
+        with tracing.span("day05.layer", map=map.name, ranges_in=len(current_ranges)) as span:
+            current_ranges = apply_layer(current_ranges, map)
+            span["ranges_out"] = len(current_ranges)
+
+    result = current_ranges.min()
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
     print(f"Result = {result}")
+    return result
 
 def day05_part2(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-    seeds, maps = parse(data, seeds_part2)
-    print(f"Seeds: {seeds},\n maps {maps}")
-    current_ranges = seeds
+    seeds, maps = parse(read_chunks(filename), seeds_part2)
+    tracing.count("day05_part2.seed_ranges", len(seeds))
+    current_ranges = to_range_set(seeds)
     for map in maps:
         # Apply a set of mapping to get a new set of ranges
-        new_ranges = set()
-        print(f"Processing {map.name} mappings")
-        for c_r in current_ranges:
-            for mapping in map.mappings:
-                ranges = mapping.apply(c_r)
-                new_ranges = new_ranges | set(ranges)
-                if ranges:
-                    # a mapping was found, exit
-                    break
-            else:
-                # if no mappings is applied, keep current range in set
-                new_ranges.add(c_r)
-        print(f"New ranges: {sorted(new_ranges)}")
-        current_ranges = new_ranges
-
-    result = sorted(new_ranges)[0].start
+        with tracing.span("day05_part2.layer", map=map.name, ranges_in=len(current_ranges)) as span:
+            current_ranges = apply_layer(current_ranges, map)
+            span["ranges_out"] = len(current_ranges)
+
+    result = current_ranges.min()
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
     print(f"Result = {result}")
+    return result
+
+def check_compose(filename):
+    "The composed map against applying the layers one by one"
+    for seed_func in (seeds_part1, seeds_part2):
+        seeds, maps = parse(read_chunks(filename), seed_func)
+        layered = to_range_set(seeds)
+        for map in maps:
+            layered = apply_layer(layered, map)
+        assert apply_layer(to_range_set(seeds), compose(maps)) == layered
+        pieces = compose(maps).pieces()
+        assert min(piecewise.min_over(pieces, r.start, r.end + 1) for r in seeds) == layered.min()
 
 if __name__ == "__main__":
     day05("day05_small.txt", expected=35)
     day05("day05.txt")
     day05_part2("day05_small.txt", expected=46)
+    check_compose("day05_small.txt")
     day05_part2("day05.txt")
@@ -3,6 +3,9 @@
 from typing import List, Set, Tuple, Collection, Dict
 
 from dataclasses import dataclass
+from math import isqrt, prod
+
+import tracing
 
 @dataclass
 class Race():
@@ -10,22 +13,32 @@ class Race():
     distance: int
 
     def ways_to_wins(self) -> int:
-        half = self.time // 2
-        other_half = self.time - half
-
-
-        ways = 0
-
-        while half * other_half > self.distance:
-            ways += 2 if half != other_half else 1 # in case it's equal like 15 ms charge for 30 ms time
-            half -= 1 # most of the time it's the smaller half 15 // 2 -> 7
-            other_half += 1
-
-        return ways
-
-
-
-
+        return ways_to_win(self.time, self.distance)
+
+
+def ways_to_win(time: int, distance: int) -> int:
+    """
+    Charging h ms wins when h * (time - h) > distance. The roots of the quadratic
+    are (time -/+ sqrt(time² - 4 distance)) / 2, isqrt gets the first winning h
+    up to one, and the wins are symmetric so the last one is time - first.
+    Exact for any size of integers.
+    """
+    disc = time * time - 4 * distance
+    if disc < 0:
+        return 0
+    first = (time - isqrt(disc)) // 2
+    # isqrt rounds down, fix the off by one either way
+    while first * (time - first) <= distance and first <= time // 2:
+        first += 1
+    while first > 0 and (first - 1) * (time - first + 1) > distance:
+        first -= 1
+    last = time - first
+    return max(0, last - first + 1)
+
+
+def ways_to_win_all(times: List[int], distances: List[int]) -> List[int]:
+    "ways_to_win of a whole table of races"
+    return list(map(ways_to_win, times, distances))
 
 
 def parse(data) -> List[Race]:
@@ -44,8 +57,6 @@ def parse_part2(data) -> Race:
         label, rest = line.split(":")
         table.append(rest.split())
 
-    print(table)
-
     return Race(int("".join(table[0])), int("".join(table[1])))
 
 
@@ -56,11 +67,12 @@ def day06(filename, expected=None):
         data = f.read().strip()
 
     races = parse(data)
-    print(races)
-    mul_ways_to_win = 1
-    for r in races:
-        print(r.ways_to_wins())
-        mul_ways_to_win *= r.ways_to_wins()
+    tracing.count("day06.races", len(races))
+    ways = ways_to_win_all([r.time for r in races], [r.distance for r in races])
+    if tracing.DEBUG:
+        for r, w in zip(races, ways):
+            tracing.event("day06.race", time=r.time, distance=r.distance, ways=w)
+    mul_ways_to_win = prod(ways)
 
 
     result = mul_ways_to_win
@@ -68,13 +80,14 @@ def day06(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(result)
+    return result
 
 def day06_part2(filename, expected=None):
     with open(filename, "r") as f:
         data = f.read().strip()
 
     race = parse_part2(data)
-    print(race)
+    tracing.event("day06_part2.race", time=race.time, distance=race.distance)
 
 
     result = race.ways_to_wins()
@@ -82,6 +95,7 @@ def day06_part2(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(result)
+    return result
 if __name__ == "__main__":
     day06("day06_small.txt", expected=288)
     day06("day06.txt")
@@ -2,14 +2,20 @@
 
 from typing import List, Set, Tuple, Collection, Dict
 
-from itertools import cycle
+from dataclasses import dataclass, field
+from itertools import chain
 from math import gcd
-import math
+from typing import Optional
 
-def parse(data) -> Tuple[str, Dict[str, Tuple[str, str]]]:
-    direction, rest = data.split("\n\n")
+import tracing
+from reader import read_lines
+
+def parse(lines) -> Tuple[str, Dict[str, Tuple[str, str]]]:
+    "Takes the non blank lines of the input, as from read_lines"
+    lines = iter(lines)
+    direction = next(lines)
     m = {}
-    for l in rest.split("\n"):
+    for l in lines:
         key, value = l.split(" = ")
         # remove parens
         value = value[1:len(value) - 1]
@@ -18,163 +24,205 @@ def parse(data) -> Tuple[str, Dict[str, Tuple[str, str]]]:
     return direction, m
         
 
-def day08(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    direction, m = parse(data)
-    print(direction, m)
-    position = "AAA"
-    step = 0
-    for d in cycle(direction):
-        print(f"Position: {position}")
-        step += 1
-        left, right = m[position]
-        print(f"direction: {d}, left: {left}, right: {right}")
-        if d == "L":
-            position = left
-
-
-        elif d == "R":
-
-            position = right
-        else:
-            exit(-1)
-
-        print(f"Position: {position}")
-        if position == "ZZZ":
-            break
+@dataclass
+class CompiledGraph:
+    """
+    The nodes as ids 0 to n - 1, with the left and right successors in lists.
+    lifts[j][x] is where a walker at x before the directions ends after
+    2^j full passes of them, filled as far as the queries need.
+    """
+    direction: str
+    names: List[str]
+    left: List[int]
+    right: List[int]
+    ids: Dict[str, int] = field(init=False, repr=False)
+    lifts: List[List[int]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.lifts = [self.walk_all(len(self.direction))]
+
+    @staticmethod
+    def compile(direction: str, m: Dict[str, Tuple[str, str]]) -> "CompiledGraph":
+        names = list(m)
+        ids = {name: i for i, name in enumerate(names)}
+        return CompiledGraph(direction, names,
+                             [ids[m[name][0]] for name in names],
+                             [ids[m[name][1]] for name in names])
+
+    def successors(self) -> List[List[int]]:
+        "The successor list of each direction"
+        return [self.left if d == "L" else self.right for d in self.direction]
+
+    def mask(self, suffix: str) -> List[bool]:
+        return [name.endswith(suffix) for name in self.names]
+
+    def walk_all(self, steps: int) -> List[int]:
+        "Position of a walker from each node after the first steps directions"
+        positions = list(range(len(self.names)))
+        for succ in self.successors()[:steps]:
+            positions = [succ[p] for p in positions]
+        return positions
+
+    def position_after(self, node: int, k: int) -> int:
+        "Where a walker from node is after k steps, in O(log k + len(direction))"
+        passes, rest = divmod(k, len(self.direction))
+        j = 0
+        while passes:
+            if j == len(self.lifts):
+                previous = self.lifts[-1]
+                self.lifts.append([previous[x] for x in previous])
+            if passes & 1:
+                node = self.lifts[j][node]
+            passes >>= 1
+            j += 1
+        for succ in self.successors()[:rest]:
+            node = succ[node]
+        return node
+
+    def first_visit(self, start: int, targets: List[bool]) -> Optional[int]:
+        "Steps to the first target, None if the walker never gets to one"
+        successors = self.successors()
+        # first step in a pass a walker from each node is on a target, 0 if none
+        hits = []
+        for x in range(len(self.names)):
+            hit = 0
+            for s, succ in enumerate(successors, 1):
+                x = succ[x]
+                if targets[x]:
+                    hit = s
+                    break
+            hits.append(hit)
+        full_pass = self.lifts[0]
+        seen = set()
+        passes = 0
+        node = start
+        # the pass starts repeat after at most n passes
+        while node not in seen:
+            if hits[node]:
+                return passes * len(self.direction) + hits[node]
+            seen.add(node)
+            node = full_pass[node]
+            passes += 1
+        return None
+
+
+def lockstep(graph: CompiledGraph, starts: List[int], z_mask: List[bool], max_steps: int) -> Optional[int]:
+    """
+    Move every walker together, the positions stay one list of ids and each
+    step is a single lookup of all of them in the successor list of the direction.
+    First step they are all on a Z, None if not within max_steps.
+    """
+    successors = graph.successors()
+    is_z = z_mask.__getitem__
+    positions = list(starts)
+    for step in range(1, max_steps + 1):
+        positions = list(map(successors[(step - 1) % len(successors)].__getitem__, positions))
+        if all(map(is_z, positions)):
+            return step
+    return None
 
+def day08(filename, expected=None):
+    direction, m = parse(read_lines(filename))
+    tracing.count("day08.nodes", len(m))
+    graph = CompiledGraph.compile(direction, m)
+    step = graph.first_visit(graph.ids["AAA"], [name == "ZZZ" for name in graph.names])
+    assert step is not None, "ZZZ can't be reached from AAA"
+    tracing.count("day08.steps", step)
 
     result = step
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 
-def factorization(n):
-
-    factors = []
-
-    def get_factor(n):
-        x_fixed = 2
-        cycle_size = 2
-        x = 2
-        factor = 1
-
-        while factor == 1:
-            for count in range(cycle_size):
-                if factor > 1: break
-                x = (x * x + 1) % n
-                factor = gcd(x - x_fixed, n)
-
-            cycle_size *= 2
-            x_fixed = x
-
-        return factor
-
-    while n > 1:
-        next = get_factor(n)
-        factors.append(next)
-        n //= next
-
-    return factors
-
-
-def isPrime(number):
-    if number == 1:
-        return False
-    if number == 2:
-        return True
-    if number % 2 == 0:
-        return False
-    for i in range(3, int(math.sqrt(number)) + 1, 2):
-        if number % i == 0:
-            return False
-
-    return True
-# An old function!
-def getPrimeList(n):
-
-    """Return a prime list up to the number n"""
-    primeList = [2]  # since starting at 3 in range()
-    for i in range(3, n, 2):  # since only uneven number are prime
-        if isPrime(i):
-            primeList.append(i)
-    return primeList
-
-def factorize(n, primes):
-    """Return a list of prime factors
+@dataclass
+class Cycle:
+    """
+    The walk of a ghost over the (node, step % len(direction)) states: after mu steps
+    it is in a loop of lam steps. Times are step counts from the start.
     """
-    factors = []
-    for p in primes:  # Get a prime from the list of prime
-        if p * p > n:  # If the prime squared is bigger than the number, break
-            break
-        i = 0
-        while n % p == 0:  # While it can be divided by the prime
-            n //= p
-            i += 1
-        if i > 0:
-            factors.append((p, i))  # append the prime and the number of loop
-    if n > 1:
-        factors.append((n, 1))
-    return factors
+    mu: int
+    lam: int
+    z_before: List[int] # Z times before the loop
+    z_loop: List[int] # Z times during the first turn of the loop
+
+    def at_z(self, t: int) -> bool:
+        if t < self.mu:
+            return t in self.z_before
+        return self.mu + (t - self.mu) % self.lam in self.z_loop
+
+
+def find_cycle(graph: CompiledGraph, start: int, z_mask: List[bool]) -> Cycle:
+    successors = graph.successors()
+    length = len(successors)
+    seen = {}
+    z_times = []
+    position = start
+    t = 0
+    # state is position * length + t % length
+    while (state := position * length + t % length) not in seen:
+        seen[state] = t
+        if z_mask[position]:
+            z_times.append(t)
+        position = successors[t % length][position]
+        t += 1
+    mu = seen[state]
+    return Cycle(mu, t - mu, [z for z in z_times if z < mu], [z for z in z_times if z >= mu])
+
+
+def crt(a: int, m: int, b: int, n: int) -> Optional[Tuple[int, int]]:
+    "x = a mod m and x = b mod n as x = c mod lcm(m, n), for any m and n, None if impossible"
+    g = gcd(m, n)
+    if (b - a) % g:
+        return None
+    k = (b - a) // g * pow(m // g, -1, n // g) % (n // g)
+    lcm = m // g * n
+    return (a + m * k) % lcm, lcm
+
+
+def first_common_z(cycles: List[Cycle]) -> Optional[int]:
+    "First time after the start all the ghosts are on a Z, None if never"
+    mu = max(c.mu for c in cycles)
+    # Before every ghost is in its loop, only the first one's Z times can do
+    first = cycles[0]
+    early = chain(first.z_before, (z + k * first.lam for k in range(mu // first.lam + 1) for z in first.z_loop))
+    for t in sorted(t for t in early if 0 < t < mu):
+        if all(c.at_z(t) for c in cycles):
+            return t
+
+    # Then each ghost is on a Z for some residues of its loop length
+    residues = [(0, 1)]
+    for c in cycles:
+        residues = [r for a, m in residues for z in c.z_loop
+                    if (r := crt(a, m, z % c.lam, c.lam)) is not None]
+    tracing.count("day08_part2.residues", len(residues))
+    start = max(mu, 1)
+    return min((start + (a - start) % m for a, m in residues), default=None)
 
-def day08_part2(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    direction, m = parse(data)
-    print(direction, m)
-    primes = getPrimeList(10000)
-    positions = list( k for k in m.keys() if k[-1] == "A")
-    step = 0
-    step_per_positions = [0 for p in positions]
-    for d in cycle(direction):
-        print(f"Positions: {positions}")
-        step += 1
-        for index, position in enumerate(positions):
-            left, right = m[position]
-            print(f"direction: {d}, left: {left}, right: {right}")
-            if d == "L":
-                positions[index] = left
-            elif d == "R":
-                positions[index] = right
-            else:
-                exit(-1)
-
-
-
-        print(f"Position: {position}")
-        if all(p[-1] == "Z" for p in positions):
-            break
-
-        for i, p in enumerate(positions):
-            if p[-1] == "Z" and step_per_positions[i] == 0:
-                step_per_positions[i] = step
-
-        if all(step_per_positions):
-            print(step_per_positions)
-            break
-
-
-    factors = set()
-    for s in step_per_positions:
-        f_list = factorize(s, primes)
-        print(f_list)
-        for f in f_list:
-            factors.add(f[0])
-    print(factors)
-        
 
-    result = 1
-    for s in factors:
-        result *= s
+def day08_part2(filename, expected=None):
+    direction, m = parse(read_lines(filename))
+    tracing.count("day08_part2.nodes", len(m))
+    starts = [k for k in m.keys() if k[-1] == "A"]
+    tracing.count("day08_part2.ghosts", len(starts))
+
+    graph = CompiledGraph.compile(direction, m)
+    z_mask = graph.mask("Z")
+    cycles = [find_cycle(graph, graph.ids[s], z_mask) for s in starts]
+    if tracing.DEBUG:
+        for s, c in zip(starts, cycles):
+            tracing.event("day08_part2.cycle", start=s, mu=c.mu, lam=c.lam, z_before=c.z_before, z_loop=c.z_loop)
+
+    result = first_common_z(cycles)
+    assert result is not None, "The ghosts are never all on a Z node together"
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     day08("day08_small.txt", expected=2)
@@ -186,3 +234,4 @@ if __name__ == "__main__":
 # Just following the positions is too long, need to find all the "cycle" and infer when they are going to all reach the same.
 # So a sort of multiplication of all?
 # Probably a smallest common divisor kind of thing?
+# Edit: the lcm only works when every ghost loops back to its first Z, find_cycle and crt handle any loop.
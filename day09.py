@@ -1,67 +1,130 @@
 #!/usr/bin/env python3
 
-from typing import List, Set, Tuple, Collection, Dict
+from typing import Callable, Iterable, Iterator, List, Set, Tuple, Collection, Dict
+from dataclasses import dataclass
+from functools import lru_cache
+from math import comb
+from operator import add, mul
 
-def parse(data) -> List[List[int]]:
-    return [[int(i) for i in l.split()] for l in data.split("\n")]
+import tracing
+from reader import read_lines
+
+def parse_line(line) -> List[int]:
+    return [int(i) for i in line.split()]
+
+def parse(lines) -> Iterator[List[int]]:
+    return (parse_line(l) for l in lines)
         
 def diff_each_step(seq: List[int]) -> List[int]:
     return [seq[i+1] - seq[i] for i in range(len(seq)-1)]
 
-def predict_next_elem(seq: List[int]) -> int:
-    if all(s == 0 for s in seq):
-        return 0
-    next_elem = seq[-1] + predict_next_elem(diff_each_step(seq))
+# Taking differences until they are all 0 and adding them back up is extrapolating
+# with the polynomial of degree n - 1 through the n values, and that is a fixed
+# weighted sum of the values, the weights only depend on n:
+#   x[n]  = sum (-1)^(n-1-i) C(n, i) x[i]
+#   x[-1] = sum (-1)^i C(n, i+1) x[i]
 
-    #print(seq, next_elem)
-    return next_elem
+@lru_cache(maxsize=None)
+def next_weights(n: int) -> Tuple[int, ...]:
+    return tuple((-1) ** (n - 1 - i) * comb(n, i) for i in range(n))
 
-def predict_previous_elem(seq: List[int]) -> int:
-    if all(s == 0 for s in seq):
-        return 0
-    previous_elem = seq[0] - predict_previous_elem(diff_each_step(seq))
+@lru_cache(maxsize=None)
+def previous_weights(n: int) -> Tuple[int, ...]:
+    return tuple((-1) ** i * comb(n, i + 1) for i in range(n))
 
-    #print(seq, previous_elem)
-    return previous_elem
+def predict_next_elem(seq: List[int]) -> int:
+    return sum(map(mul, next_weights(len(seq)), seq))
 
+def predict_previous_elem(seq: List[int]) -> int:
+    return sum(map(mul, previous_weights(len(seq)), seq))
+
+def predict_all(sequences: Iterable[List[int]], weights: Callable[[int], Tuple[int, ...]]) -> List[int]:
+    "The weights times each sequence, for a whole table of them"
+    return [sum(map(mul, weights(len(seq)), seq)) for seq in sequences]
+
+def sum_predictions(sequences: Iterable[List[int]], weights: Callable[[int], Tuple[int, ...]]) -> int:
+    """
+    Sum of the predictions. It's linear, so the column sums of the sequences of
+    each length are added up first and the weights applied once per length.
+    """
+    columns: Dict[int, List[int]] = {}
+    for seq in sequences:
+        column = columns.setdefault(len(seq), [0] * len(seq))
+        columns[len(seq)] = list(map(add, column, seq))
+    tracing.count("day09.lengths", len(columns))
+    return sum(sum(map(mul, weights(n), column)) for n, column in columns.items())
+
+
+@dataclass
+class Forecaster:
+    """
+    The polynomial through a sequence in Newton form: the value at index t is
+    sum C(t, j) coefficients[j], where coefficients[j] is the first value of the
+    j-th differences. The trailing zero differences are dropped, so a query
+    costs the degree, for any t, before (t < 0) or after the sequence.
+    """
+    length: int
+    coefficients: List[int]
+
+    @staticmethod
+    def from_sequence(seq: List[int]) -> "Forecaster":
+        coefficients = []
+        diffs = seq
+        while any(diffs):
+            coefficients.append(diffs[0])
+            diffs = diff_each_step(diffs)
+        return Forecaster(len(seq), coefficients)
+
+    def at(self, t: int) -> int:
+        result = 0
+        binomial = 1 # C(t, j), also for a negative t
+        for j, c in enumerate(self.coefficients):
+            result += binomial * c
+            binomial = binomial * (t - j) // (j + 1)
+        return result
+
+    def ahead(self, k: int) -> int:
+        "k steps after the last value, 1 is the next one"
+        return self.at(self.length - 1 + k)
+
+    def behind(self, k: int) -> int:
+        "k steps before the first value, 1 is the previous one"
+        return self.at(-k)
+
+
+def forecast(forecasters: List[Forecaster], queries: Iterable[Tuple[int, int]]) -> List[int]:
+    "Value of each (sequence index, t) query"
+    return [forecasters[i].at(t) for i, t in queries]
 
 def day09(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
+    sequences = parse(read_lines(filename))
 
-    sequences = parse(data)
+    if tracing.DEBUG:
+        sequences = list(sequences)
+        for s in sequences:
+            tracing.event("day09.next_elem", next_elem=predict_next_elem(s))
 
-    print(sequences)
-    sum_next_elems = 0
-    for s in sequences:
-        next_elem = predict_next_elem(s)
-        print(next_elem)
-        sum_next_elems += next_elem
-
-    result = sum_next_elems
+    result = sum_predictions(sequences, next_weights)
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 def day09_part2(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    sequences = parse(data)
+    sequences = parse(read_lines(filename))
 
-    print(sequences)
-    sum_previous_elems = 0
-    for s in sequences:
-        previous_elem = predict_previous_elem(s)
-        print(previous_elem)
-        sum_previous_elems += previous_elem
+    if tracing.DEBUG:
+        sequences = list(sequences)
+        for s in sequences:
+            tracing.event("day09_part2.previous_elem", previous_elem=predict_previous_elem(s))
 
-    result = sum_previous_elems
+    result = sum_predictions(sequences, previous_weights)
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     day09("day09_small.txt", expected=114)
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 
-from typing import List, Set, Tuple, Collection, Dict
+from typing import Iterator, List, Set, Tuple, Collection, Dict
 
 from dataclasses import dataclass
 
+import tracing
+
 # Coordinates based on y going down, x going right
 PIPES = {
     "|": [(0, -1), (0, 1) ],
@@ -14,190 +16,173 @@ PIPES = {
     "F": [(0, 1), (1, 0) ],
          }
 
-@dataclass(frozen=True)
-class Pipe:
-    shape: str
-    x: int
-    y: int
-    def next_pipe_pos(self) -> List[Tuple[int, int]]:
-        "Possible pipes"
-        if self.shape not in PIPES:
-            return []
-        offsets = PIPES[self.shape]
-        return [(self.x + x, self.y + y) for x,y in offsets]
-
+# Directions as numbers, opposite of d is (d + 2) % 4
+NORTH, EAST, SOUTH, WEST = range(4)
+OFFSETS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
 
+# TURNS[tile][d] is the direction out of a tile entered going d, -1 if the pipe doesn't take it
+TURNS = [[-1] * 4 for _ in range(256)]
+for shape, offsets in PIPES.items():
+    a, b = (OFFSETS.index(o) for o in offsets)
+    TURNS[ord(shape)][(a + 2) % 4] = b
+    TURNS[ord(shape)][(b + 2) % 4] = a
 
+# Only these count as crossing the loop when going left to right on a row,
+# F and 7 would count the same horizontal part twice with L and J
+CROSSING_PIPES = {ord("L"), ord("J"), ord("|")}
 
 
 @dataclass
-class Node:
-    v: Pipe
-    left: Pipe | None
-    right: Pipe | None
-
+class Loop:
+    length: int
+    bitmap: bytearray # bit i is set when tile i is on the loop
+    area: int # inside the path through the tile centers, by the shoelace formula
 
+    def __contains__(self, i: int) -> bool:
+        return self.bitmap[i >> 3] >> (i & 7) & 1
 
 
 @dataclass
 class Grid:
-    grid: List[List[Pipe]]
-    start: Pipe
-
-    def get_pipe(self, x, y) -> Pipe | None:
-        if x < 0 or y < 0 or x >= len(self.grid[0]) or y >= len(self.grid):
-            return None
-        return self.grid[y][x]
-
-    def find_connected_start(self) -> (Pipe, Pipe):
-        directions = [
-            (self.start.x, self.start.y - 1),
-            (self.start.x, self.start.y + 1),
-            (self.start.x - 1, self.start.y),
-            (self.start.x + 1, self.start.y),
-        ]
-        pipes = []
-        for d in directions:
-            p = self.get_pipe(*d)
-            if not p:
-                continue
-            for x, y in p.next_pipe_pos():
-                if x == self.start.x and y == self.start.y:
-                    pipes.append(p)
-
-
-        return tuple(pipes)
-                    
+    # One byte per tile, row after row, with a border of "." all around
+    # so the neighbours of any pipe are in the grid
+    tiles: bytearray
+    width: int # with the border
+    height: int
+    start: int
+
+    def deltas(self) -> List[int]:
+        "Index offset of a step in each direction"
+        return [dy * self.width + dx for dx, dy in OFFSETS]
+
+    def find_start_exits(self) -> List[int]:
+        "Directions from the start with a pipe connected back to it"
+        deltas = self.deltas()
+        return [d for d in range(4) if TURNS[self.tiles[self.start + deltas[d]]][d] != -1]
 
     def find_start_shape(self) -> str:
-        p1, p2 = self.find_connected_start()
-
-        # Get the original offset that would have been applied to start
-        # start.x + ? = p1.x
-        # ? = p1.x - start.x
-        diff_1 = (p1.x - self.start.x,  p1.y - self.start.y)
-        diff_2 = (p2.x - self.start.x,  p2.y - self.start.y)
-
-        # find the shape with those offsets
+        exits = [OFFSETS[d] for d in self.find_start_exits()]
         for shape, offsets in PIPES.items():
-            if diff_1 in offsets and diff_2 in offsets:
+            if sorted(offsets) == sorted(exits):
                 return shape
 
-    def print_grid(self, loop: Set[Pipe]):
-        #Debug function
-        print("Grid:")
-        count_i = 0
-        for y, line in enumerate(self.grid):
-            print_line = []
-            for x, p in enumerate(line):
-                if p in loop:
-                    print_line.append(p.shape)
+    def trace_loop(self) -> Loop:
+        tiles = self.tiles
+        deltas = self.deltas()
+        bitmap = bytearray(len(tiles) // 8 + 1)
+        i = self.start
+        d = self.find_start_exits()[0]
+        y = i // self.width
+        length = 0
+        area = 0
+        while True:
+            bitmap[i >> 3] |= 1 << (i & 7)
+            i += deltas[d]
+            length += 1
+            # shoelace, only the horizontal steps add to the area
+            if d == EAST:
+                area -= y
+            elif d == WEST:
+                area += y
+            elif d == SOUTH:
+                y += 1
+            else:
+                y -= 1
+            if i == self.start:
+                break
+            d = TURNS[tiles[i]][d]
+        tracing.count("day10.loop_length", length)
+        return Loop(length, bitmap, abs(area))
+
+    def count_enclosed(self, loop: Loop) -> int:
+        "Pick's theorem: area = inside + boundary / 2 - 1, the loop tiles are the boundary"
+        return loop.area - loop.length // 2 + 1
+
+    def inside_rows(self, loop: Loop) -> Iterator[List[bool]]:
+        """
+        For each row, which tiles are inside the loop. Parse left to right, each
+        L, J or | of the loop crossed flips between outside and inside.
+        """
+        start_shape = ord(self.find_start_shape())
+        for y in range(1, self.height - 1):
+            inside = False
+            row = []
+            for i in range(y * self.width + 1, (y + 1) * self.width - 1):
+                if i in loop:
+                    shape = start_shape if i == self.start else self.tiles[i]
+                    if shape in CROSSING_PIPES:
+                        inside = not inside
+                    row.append(False)
                 else:
-                    print_line.append("I" if self.is_in_loop(loop, p) else "O")
-
-            print("".join(print_line))
-            count_i += print_line.count("I")
-
-        print(count_i)
-
-
-    def is_in_loop(self, loop: Set[Pipe], p: Pipe) -> bool:
-        # parse left to right, count the crossing of the loop
-        crossing_pipes = ["L", "J", "|"]
-        row = p.y
-        crossing_count = 0
-        for x in range(0, p.x + 1):
-            tile = self.grid[row][x]
-            # special case for start
-            if tile == self.start:
-                tile = Pipe(shape=self.find_start_shape(), x=tile.x, y=tile.y)
-
-            if tile in loop and tile.shape in crossing_pipes:
-                crossing_count += 1
-
-        # An uneven count means it's in the loop
-        return crossing_count % 2 == 1
-                
-                
-
-
-
+                    row.append(inside)
+            yield row
 
-            
+    def draw(self, loop: Loop) -> Iterator[str]:
+        "The rows with the loop pipes, I for the tiles inside and O for the others"
+        for y, inside in enumerate(self.inside_rows(loop), 1):
+            line = self.tiles[y * self.width + 1:(y + 1) * self.width - 1].decode()
+            yield "".join(c if y * self.width + 1 + x in loop else "I" if i else "O"
+                          for x, (c, i) in enumerate(zip(line, inside)))
 
+    def print_grid(self, loop: Loop):
+        #Debug function
+        print("Grid:")
+        for row in self.draw(loop):
+            print(row)
 
 
-
-def parse(data) -> Grid:
-    grid = []
-    for y, line in enumerate(data.split("\n")):
-        row = []
-        for x, c in enumerate(line):
-            row.append(Pipe(shape=c, x=x, y=y))
-        grid.append(row)
-
-    start = find_start(grid)
-    return Grid(grid, start)
-
-def find_start(grid) -> Pipe:
-    for line in grid:
-        for p in line:
-            if p.shape == "S":
-                return p
-
+def parse(data: bytes) -> Grid:
+    lines = data.split(b"\n")
+    width = max(len(l) for l in lines) + 2
+    border = b"." * width
+    tiles = bytearray(border)
+    for line in lines:
+        tiles += b"." + line.ljust(width - 2, b".") + b"."
+    tiles += border
+    return Grid(tiles, width, len(lines) + 2, tiles.find(b"S"))
 
 
-def day10(filename, expected=None):
-    with open(filename, "r") as f:
+def read_grid(filename) -> Grid:
+    with open(filename, "rb") as f:
         data = f.read().strip()
-
-    grid = parse(data)
+    return parse(data.replace(b"\r", b""))
 
 
-    print(grid)
-    print("connected", grid.find_connected_start())
-    explored = set([grid.start])
-    print(explored)
-    p1, p2 = grid.find_connected_start()
-    step = 0
-    while True:
-        p1_next = [grid.get_pipe(*p) for p in p1.next_pipe_pos() if grid.get_pipe(*p) not in explored]
-        p2_next = [grid.get_pipe(*p) for p in p2.next_pipe_pos() if grid.get_pipe(*p) not in explored]
-        step += 1
-        explored.add(p1)
-        explored.add(p2)
-        if p1 == p2:
-            print("Reached the end, same pipe", p1, p2)
-            break
-        p1 = p1_next[0]
-        p2 = p2_next[0]
-
-    print(len(explored))
-    
-    # For each non-explored part of the grid, calculate the number of "crossing"
-    # Only the follwing increase it
+def day10(filename, expected=None):
+    grid = read_grid(filename)
+    loop = grid.trace_loop()
 
+    # the farthest pipe is half way around
+    result = loop.length // 2
+    if expected:
+        assert result == expected, f"expected {expected}, got {result}"
 
+    print(f"Result part 1: {result}")
+    return result
 
 
+def day10_part2(filename, expected=None):
+    grid = read_grid(filename)
+    loop = grid.trace_loop()
+    tracing.event("day10_part2.start_shape", shape=grid.find_start_shape())
+    if tracing.DEBUG:
+        for y, row in enumerate(grid.draw(loop)):
+            tracing.event("day10_part2.row", y=y, row=row)
 
-    result = step
+    result = grid.count_enclosed(loop)
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
-    print(f"Result part 1: {result}")
-
-    shape = grid.find_start_shape()
-
-    print(f"Shape start: {shape}")
-    grid.print_grid(explored)
+    print(f"Result part 2: {result}")
+    return result
 
 
 
 if __name__ == "__main__":
     day10("day10_small.txt", expected=8)
-    day10("day10_part2_small.txt")
+    day10_part2("day10_part2_small.txt", expected=4)
     #day10("day10.txt")
+    #day10_part2("day10.txt")
 
 # This problem will need a tree or a graph. I expect the part 2 to need an efficient algo
 #
@@ -208,3 +193,4 @@ if __name__ == "__main__":
 # and use the ray casting point in polygon approach.
 #
 # For some reason, it seems like the only valid "crossing" are L, J and |. I don't get why it works but the tests works
+# Edit: the loop walked through the tile centers is a polygon, so Pick's theorem gives the count without the crossings.
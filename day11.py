@@ -4,6 +4,9 @@ from typing import List, Set, Tuple, Collection, Dict
 
 from dataclasses import dataclass
 
+import tracing
+from reader import read_lines
+
 @dataclass(frozen=True)
 class G: # Galaxy, but short name
     id: int
@@ -12,6 +15,37 @@ class G: # Galaxy, but short name
 
 
 
+@dataclass
+class Sky:
+    "The galaxies and which rows and columns have one, without the grid"
+    galaxies: List[G]
+    occupied_rows: bytearray
+    occupied_columns: bytearray
+
+    def expansion_factor(self) -> Tuple[List[int], List[int]]:
+        "Same as find_expansion_factor, from the bitmaps"
+        cols = [x for x, occupied in enumerate(self.occupied_columns) if not occupied]
+        rows = [y for y, occupied in enumerate(self.occupied_rows) if not occupied]
+        return (cols, rows)
+
+
+def read_sky(filename) -> Sky:
+    "Streams the image, memory is the galaxies plus a byte per row and per column"
+    galaxies = []
+    occupied_rows = bytearray()
+    occupied_columns = bytearray()
+    for y, line in enumerate(read_lines(filename)):
+        if len(line) > len(occupied_columns):
+            occupied_columns.extend(bytes(len(line) - len(occupied_columns)))
+        occupied_rows.append(0)
+        x = line.find("#")
+        while x >= 0:
+            galaxies.append(G(id=len(galaxies) + 1, x=x, y=y))
+            occupied_rows[y] = 1
+            occupied_columns[x] = 1
+            x = line.find("#", x + 1)
+    return Sky(galaxies, occupied_rows, occupied_columns)
+
 def parse(data) -> List[List[bool]]:
     grid = []
     for line in data.split("\n"):
@@ -63,32 +97,17 @@ def find_distance(g1, g2):
 
 
 def day11(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    grid = parse(data)
-
-    print_grid(grid)
-    grid = expand_space(grid)
-    print_grid(grid)
-    galaxies = find_galaxies(grid)
-    print(galaxies)
-
-    print("1 and 7: ", find_distance(galaxies[0], galaxies[6]))
-    print("3 and 6: ", find_distance(galaxies[2], galaxies[5]))
-    print("8 and 9: ", find_distance(galaxies[7], galaxies[8]))
-    sum = 0
-    for pos, g1 in enumerate(galaxies):
-        for g2 in galaxies[pos:]:
-            sum += find_distance(g1, g2)
-        
-
-    
-    result = sum
+    sky = read_sky(filename)
+    tracing.count("day11.galaxies", len(sky.galaxies),
+                  width=len(sky.occupied_columns), height=len(sky.occupied_rows))
+
+    # Each empty line counts twice, same as expand_space
+    result = distance_sums(sky.galaxies, sky.expansion_factor(), [2])[0]
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 def find_factor_row(grid) -> List[int]:
     factor = []
@@ -124,27 +143,249 @@ def find_expanded_distance(g1, g2, exp_fac, factor: int):
     return (max_x - min_x + x_between * (factor - 1)) + (max_y - min_y + y_between * (factor - 1))
 
 
+def axis_sums(coords: List[int], empty: List[int]) -> Tuple[int, int]:
+    """
+    On one axis, for all the pairs: the sum of the distances, and the sum of
+    the empty lines between them. Sorted, the k-th coordinate is the larger one
+    in k pairs and the smaller in n - 1 - k, and there is never an empty line on
+    a galaxy, so the empty lines between two is a difference of prefix counts.
+    """
+    coords = sorted(coords)
+    n = len(coords)
+    distances = 0
+    empties = 0
+    e = 0 # empty lines before coords[k]
+    for k, c in enumerate(coords):
+        while e < len(empty) and empty[e] < c:
+            e += 1
+        distances += c * (2 * k - n + 1)
+        empties += e * (2 * k - n + 1)
+    return distances, empties
+
+
+def distance_sums(galaxies: List[G], exp_fac, factors: List[int]) -> List[int]:
+    "Sum of the expanded distances of all the pairs, for each factor"
+    x_fact, y_fact = exp_fac
+    x_distances, x_empties = axis_sums([g.x for g in galaxies], sorted(x_fact))
+    y_distances, y_empties = axis_sums([g.y for g in galaxies], sorted(y_fact))
+    return [x_distances + y_distances + (factor - 1) * (x_empties + y_empties) for factor in factors]
+
+# Incremental index, for a catalogue of galaxies changing over time.
+# The total of the expanded distances is A + (factor - 1) * B on each axis, with
+# A the sum of the distances of all the pairs and B the sum of the empty lines
+# between them. An empty line e with L galaxies before it is between L * (n - L)
+# pairs, so B = n * sum(L) - sum(L²) over the empty lines.
+
+class Fenwick:
+    "Prefix sums with point updates, both O(log n)"
+    def __init__(self, size: int):
+        self.tree = [0] * (size + 1)
+
+    def add(self, i: int, value: int):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += value
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        "Sum of the values before i"
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+
+class EmptyLines:
+    """
+    Lazy segment tree over the lines of an axis, keeping for the empty ones
+    their count k, the sum of their L and the sum of L², where L is the number of
+    galaxies before the line. Adding d to every L of a range only needs the sums:
+    sum((L + d)²) = sum(L²) + 2 d sum(L) + d² k.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.k = [0] * (4 * size)
+        self.s1 = [0] * (4 * size)
+        self.s2 = [0] * (4 * size)
+        self.lazy = [0] * (4 * size)
+        if size > 0:
+            self._build(1, 0, size - 1)
+
+    def _build(self, node, lo, hi):
+        if lo == hi:
+            self.k[node] = 1
+            return
+        mid = (lo + hi) // 2
+        self._build(2 * node, lo, mid)
+        self._build(2 * node + 1, mid + 1, hi)
+        self.k[node] = self.k[2 * node] + self.k[2 * node + 1]
+
+    def _apply(self, node, d):
+        self.s2[node] += 2 * d * self.s1[node] + d * d * self.k[node]
+        self.s1[node] += d * self.k[node]
+        self.lazy[node] += d
+
+    def _pull(self, node):
+        for values in (self.k, self.s1, self.s2):
+            values[node] = values[2 * node] + values[2 * node + 1]
+
+    def _push(self, node):
+        if self.lazy[node]:
+            self._apply(2 * node, self.lazy[node])
+            self._apply(2 * node + 1, self.lazy[node])
+            self.lazy[node] = 0
+
+    def add(self, start: int, end: int, d: int, node=1, lo=0, hi=None):
+        "Add d to the L of the lines start to end, included"
+        if hi is None:
+            hi = self.size - 1
+        if end < lo or hi < start:
+            return
+        if start <= lo and hi <= end:
+            self._apply(node, d)
+            return
+        self._push(node)
+        mid = (lo + hi) // 2
+        self.add(start, end, d, 2 * node, lo, mid)
+        self.add(start, end, d, 2 * node + 1, mid + 1, hi)
+        self._pull(node)
+
+    def set(self, i: int, empty: bool, before: int, node=1, lo=0, hi=None):
+        "Mark line i as empty, with before galaxies before it, or as occupied"
+        if hi is None:
+            hi = self.size - 1
+        if lo == hi:
+            self.k[node] = 1 if empty else 0
+            self.s1[node] = before if empty else 0
+            self.s2[node] = before * before if empty else 0
+            return
+        self._push(node)
+        mid = (lo + hi) // 2
+        if i <= mid:
+            self.set(i, empty, before, 2 * node, lo, mid)
+        else:
+            self.set(i, empty, before, 2 * node + 1, mid + 1, hi)
+        self._pull(node)
+
+    def moments(self) -> Tuple[int, int]:
+        if self.size == 0:
+            return 0, 0
+        return self.s1[1], self.s2[1]
+
+
+class AxisIndex:
+    "The galaxy coordinates on one axis, from 0 to size - 1"
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.count_tree = Fenwick(size)
+        self.sum_tree = Fenwick(size)
+        self.empty = EmptyLines(size)
+        self.n = 0
+        self.total = 0 # sum of the coordinates
+        self.distances = 0 # A
+
+    def _distances_to(self, c: int) -> int:
+        "Sum of the distances from c to the galaxies in the index"
+        below = self.count_tree.prefix(c)
+        below_sum = self.sum_tree.prefix(c)
+        above = self.n - self.count_tree.prefix(c + 1)
+        above_sum = self.total - self.sum_tree.prefix(c + 1)
+        return c * below - below_sum + above_sum - c * above
+
+    def _update(self, c: int, d: int):
+        self.counts[c] += d
+        self.count_tree.add(c, d)
+        self.sum_tree.add(c, d * c)
+        self.n += d
+        self.total += d * c
+        if c + 1 < len(self.counts):
+            self.empty.add(c + 1, len(self.counts) - 1, d)
+
+    def insert(self, c: int):
+        self.distances += self._distances_to(c)
+        self._update(c, 1)
+        if self.counts[c] == 1:
+            self.empty.set(c, False, 0)
+
+    def remove(self, c: int):
+        assert self.counts[c] > 0, f"No galaxy at {c}"
+        self._update(c, -1)
+        self.distances -= self._distances_to(c)
+        if self.counts[c] == 0:
+            self.empty.set(c, True, self.count_tree.prefix(c))
+
+    def empties(self) -> int:
+        "B, the empty lines between all the pairs"
+        s1, s2 = self.empty.moments()
+        return self.n * s1 - s2
+
+
+class DistanceIndex:
+    "Total expanded distance of all the pairs, with O(log size) inserts and removes"
+    def __init__(self, width: int, height: int):
+        self.x = AxisIndex(width)
+        self.y = AxisIndex(height)
+
+    @staticmethod
+    def from_sky(sky: Sky) -> "DistanceIndex":
+        index = DistanceIndex(len(sky.occupied_columns), len(sky.occupied_rows))
+        for g in sky.galaxies:
+            index.insert(g)
+        return index
+
+    def insert(self, g: G):
+        self.x.insert(g.x)
+        self.y.insert(g.y)
+
+    def remove(self, g: G):
+        self.x.remove(g.x)
+        self.y.remove(g.y)
+
+    def total(self, factor: int) -> int:
+        return (self.x.distances + self.y.distances
+                + (factor - 1) * (self.x.empties() + self.y.empties()))
+
 def day11_part2(filename, factor, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    grid = parse(data)
-
-    galaxies = find_galaxies(grid)
-    #print(galaxies)
-    exp_fac = find_expansion_factor(grid)
-        
-    sum = 0
-    for pos, g1 in enumerate(galaxies):
-        for g2 in galaxies[pos:]:
-            sum += find_expanded_distance(g1, g2, exp_fac, factor)
-
-    
-    result = sum
+    sky = read_sky(filename)
+    exp_fac = sky.expansion_factor()
+    tracing.count("day11_part2.galaxies", len(sky.galaxies),
+                  empty_columns=len(exp_fac[0]), empty_rows=len(exp_fac[1]))
+
+    result = distance_sums(sky.galaxies, exp_fac, [factor])[0]
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
+
+def check_index(filename):
+    "The index against distance_sums, while removing the galaxies one by one and putting them back"
+    sky = read_sky(filename)
+    width, height = len(sky.occupied_columns), len(sky.occupied_rows)
+    index = DistanceIndex.from_sky(sky)
+    galaxies = list(sky.galaxies)
+
+    def expected(galaxies, factor):
+        xs = {g.x for g in galaxies}
+        ys = {g.y for g in galaxies}
+        exp_fac = ([x for x in range(width) if x not in xs], [y for y in range(height) if y not in ys])
+        return distance_sums(galaxies, exp_fac, [factor])[0]
+
+    removed = []
+    while galaxies:
+        for factor in (1, 2, 100):
+            assert index.total(factor) == expected(galaxies, factor), (len(galaxies), factor)
+        # from the middle, so the empty lines change on both sides
+        g = galaxies.pop(len(galaxies) // 2)
+        index.remove(g)
+        removed.append(g)
+    assert index.total(2) == 0
+    for g in removed:
+        index.insert(g)
+        galaxies.append(g)
+        assert index.total(10) == expected(galaxies, 10), len(galaxies)
+    assert DistanceIndex(0, 0).total(2) == 0
 
 if __name__ == "__main__":
     #day11("day11_small.txt", expected=374)
@@ -152,4 +393,5 @@ if __name__ == "__main__":
     day11_part2("day11_small.txt", factor=2, expected=374)
     day11_part2("day11_small.txt", factor=10, expected=1030)
     day11_part2("day11_small.txt", factor=100, expected=8410)
+    check_index("day11_small.txt")
     day11_part2("day11.txt", factor=1000000)
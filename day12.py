@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
-from typing import List, Set, Tuple, Collection, Dict
+from typing import Iterable, Iterator, List, Set, Tuple, Collection, Dict
 
 from dataclasses import dataclass
-from itertools import repeat
+from itertools import chain, repeat
+from operator import add
+
+import tracing
+from reader import read_lines
 
 @dataclass
 class DamagedRecord:
@@ -51,22 +55,270 @@ class DamagedRecord:
 
 
 
-def possible_arrangements(r: DamagedRecord) -> int:
-    if r.is_complete():
-        return 1 if r.is_valid() else 0
-
-    if r.is_invalid():
-        return 0
+def count_arrangements(record: str, groups: List[int]) -> int:
+    """
+    Count the arrangements left to right, without building them. The state after
+    a position is (groups done, length of the current # run), and the number of
+    ways to get to each state is carried from one position to the next, so it's
+    O(len(record) * sum(groups)).
+    """
+    states = {(0, 0): 1}
+    for c in record:
+        next_states: Dict[Tuple[int, int], int] = {}
+        for (group, run), ways in states.items():
+            if c != "." and group < len(groups) and run < groups[group]:
+                # damaged, the run goes on
+                key = (group, run + 1)
+                next_states[key] = next_states.get(key, 0) + ways
+            if c != "#":
+                # operational, ends the run if it's the right length
+                if run == 0:
+                    key = (group, 0)
+                elif run == groups[group]:
+                    key = (group + 1, 0)
+                else:
+                    continue
+                next_states[key] = next_states.get(key, 0) + ways
+        states = next_states
+    # the last run can end with the record
+    done = states.get((len(groups), 0), 0)
+    if groups:
+        done += states.get((len(groups) - 1, groups[-1]), 0)
+    return done
 
-    possible_records = []
-    for state in [".", "#"]:
-        new_r = get_possible_arrangement(r, state)
-        possible_records.append(new_r)
 
-    return sum(possible_arrangements(r) for r in possible_records)
-    
+def possible_arrangements(r: DamagedRecord) -> int:
+    return count_arrangements(r.record, r.groups)
 
 
+@dataclass
+class BitRecord:
+    """
+    The record as bitmasks, bit i for position i, and for each group the
+    positions it can start at, as a bitmask too: every spring under it can be
+    damaged, and the ones right before and after it can be operational.
+    """
+    length: int
+    damaged: int
+    operational: int
+    unknown: int
+    groups: List[int]
+    placements: List[int]
+
+    @staticmethod
+    def from_record(r: DamagedRecord) -> "BitRecord":
+        damaged = operational = unknown = 0
+        for i, c in enumerate(r.record):
+            if c == "#":
+                damaged |= 1 << i
+            elif c == ".":
+                operational |= 1 << i
+            else:
+                unknown |= 1 << i
+        n = len(r.record)
+        can_be_damaged = damaged | unknown
+        # outside of the record counts as operational, bit p of before is the spring
+        # before p and bit p of after >> g the one after a group of g starting at p
+        before = (operational | unknown) << 1 | 1
+        after = operational | unknown | 1 << n
+        by_length: Dict[int, int] = {}
+        for g in set(r.groups):
+            # bit p is set when the g springs from p on can all be damaged
+            run = can_be_damaged
+            for i in range(1, g):
+                run &= can_be_damaged >> i
+            by_length[g] = run & before & after >> g & (1 << max(n - g + 1, 0)) - 1
+        placements = [by_length[g] for g in r.groups]
+        return BitRecord(n, damaged, operational, unknown, r.groups, placements)
+
+    def starts_window(self) -> List[Tuple[int, int]]:
+        """
+        For each group, the first and last positions it can start at, with the
+        groups before it placed as far left as they go and the ones after as far
+        right. Empty if some group can't be placed.
+        """
+        lowest = []
+        pos = 0
+        for g, starts in zip(self.groups, self.placements):
+            left = starts >> pos
+            if not left:
+                return []
+            pos += (left & -left).bit_length() - 1
+            lowest.append(pos)
+            pos += g + 1
+        highest = []
+        # the group can end right before end
+        end = self.length + 1
+        for g, starts in zip(reversed(self.groups), reversed(self.placements)):
+            fitting = starts & (1 << max(end - g, 0)) - 1
+            if not fitting:
+                return []
+            end = fitting.bit_length() - 1
+            highest.append(end)
+        return list(zip(lowest, reversed(highest)))
+
+    def count(self) -> int:
+        """
+        Same as possible_arrangements. ways[pos] is the number of ways to place the
+        groups from group on, starting at pos or after, filled from the last group
+        to the first, without recursion. Only the positions between where the
+        group could start and where the group before it could end are filled.
+        """
+        n = self.length
+        if not self.groups:
+            return 0 if self.damaged else 1
+        window = self.starts_window()
+        if not window:
+            return 0
+        # the bits once, lowest first, rather than shifting the masks at each position
+        damaged = [b == "1" for b in bin(self.damaged)[:1:-1].ljust(n, "0")]
+        bits: Dict[int, str] = {}
+        # no group left, no damaged spring can be left either
+        last = self.damaged.bit_length()
+        ways = [0] * last + [1] * (n + 2 - last)
+        for group in reversed(range(len(self.groups))):
+            g = self.groups[group]
+            if g not in bits:
+                bits[g] = bin(self.placements[group])[:1:-1].ljust(n, "0")
+            starts = bits[g]
+            lowest, highest = window[group]
+            floor = window[group - 1][0] + self.groups[group - 1] + 1 if group else 0
+            current = [0] * (n + 2)
+            for pos in range(highest, min(lowest, floor) - 1, -1):
+                if starts[pos] == "1":
+                    current[pos] = ways[pos + g + 1]
+                # a damaged spring at pos has to be the start of this group
+                if not damaged[pos]:
+                    current[pos] += current[pos + 1]
+            ways = current
+        return ways[0]
+
+# Unfolding k times, with transfer matrices. Between two copies all that matters is
+# the state (j, run): the current group is groups[j], the record is periodic in
+# the groups, and run of it is already there. Going through one "?" + record
+# moves from a state to another while completing some groups, so the matrix
+# entries are polynomials where the coefficient of z^d counts the ways to do it
+# completing d groups. The unfolded record is valid when exactly k * m groups are
+# done, so the polynomials are cut at that degree and k copies are O(log k)
+# products of matrices.
+
+Poly = List[int]
+
+
+def poly_add(a: Poly, b: Poly) -> Poly:
+    if len(a) < len(b):
+        a, b = b, a
+    return [x + y for x, y in zip(a, b)] + a[len(b):]
+
+
+def poly_mul(a: Poly, b: Poly, degree: int) -> Poly:
+    "a * b without the terms above degree"
+    result = [0] * min(len(a) + len(b) - 1, degree + 1)
+    # mostly zeros, only go through the terms of b once
+    terms = [(j, y) for j, y in enumerate(b[:degree + 1]) if y]
+    for i, x in enumerate(a[:degree + 1]):
+        if x:
+            for j, y in terms:
+                if i + j > degree:
+                    break
+                result[i + j] += x * y
+    return result
+
+
+def transfer_matrix(record: str, groups: List[int], states: List[Tuple[int, int]]) -> List[List[Poly]]:
+    "matrix[s][t] counts the ways from state s to t through the record, by groups done"
+    index = {s: i for i, s in enumerate(states)}
+    m = len(groups)
+    matrix = []
+    for start in states:
+        # same as count_arrangements, with the groups done in the state
+        current = {start + (0,): 1}
+        for c in record:
+            next_states: Dict[Tuple[int, int, int], int] = {}
+            for (j, run, done), ways in current.items():
+                if c != "." and run < groups[j]:
+                    key = (j, run + 1, done)
+                    next_states[key] = next_states.get(key, 0) + ways
+                if c != "#":
+                    if run == 0:
+                        key = (j, 0, done)
+                    elif run == groups[j]:
+                        key = ((j + 1) % m, 0, done + 1)
+                    else:
+                        continue
+                    next_states[key] = next_states.get(key, 0) + ways
+            current = next_states
+        row: List[Poly] = [[] for _ in states]
+        for (j, run, done), ways in current.items():
+            poly = row[index[j, run]]
+            poly.extend([0] * (done + 1 - len(poly)))
+            poly[done] += ways
+        matrix.append(row)
+    return matrix
+
+
+def vector_times(vector: List[Poly], matrix: List[List[Poly]], degree: int) -> List[Poly]:
+    result: List[Poly] = [[] for _ in vector]
+    for poly, row in zip(vector, matrix):
+        if poly:
+            for t, entry in enumerate(row):
+                if entry:
+                    result[t] = poly_add(result[t], poly_mul(poly, entry, degree))
+    return result
+
+
+def matrix_square(matrix: List[List[Poly]], degree: int) -> List[List[Poly]]:
+    return [vector_times(row, matrix, degree) for row in matrix]
+
+
+def is_monomial(polys: Iterable[Poly]) -> bool:
+    return all(sum(1 for c in p if c) <= 1 for p in polys)
+
+
+def unfolded_arrangements(record: str, groups: List[int], factors: List[int]) -> List[int]:
+    """
+    possible_arrangements of the record unfolded k times, for each k of factors.
+
+    The matrices only win while every entry is a single term, when the number of
+    groups done between two states doesn't depend on the way. Otherwise the
+    polynomials fill up to degree k * m with numbers of about k * len(record) bits,
+    and multiplying them costs more than count_arrangements on the unfolded
+    record, so that is used instead.
+    """
+    if not groups:
+        return [0 if "#" in record else 1 for _ in factors]
+
+    def unfolded_count(k):
+        return count_arrangements("?".join([record] * k), groups * k)
+
+    m = len(groups)
+    degree = max(factors) * m
+    states = [(j, run) for j in range(m) for run in range(groups[j] + 1)]
+    # the first copy has no "?" before it
+    first = [[1] if s == (0, 0) else [] for s in states]
+    first = vector_times(first, transfer_matrix(record, groups, states), degree)
+
+    # powers[i] is the matrix of 2^i copies
+    powers = [transfer_matrix("?" + record, groups, states)]
+    while 1 << len(powers) <= max(factors) - 1:
+        if not is_monomial(first) or not is_monomial(p for row in powers[-1] for p in row):
+            tracing.event("day12.unfolded_fallback", record=record, groups=groups)
+            return [unfolded_count(k) for k in factors]
+        powers.append(matrix_square(powers[-1], degree))
+
+    results = []
+    for k in factors:
+        assert k >= 1, f"Can't unfold {k} times"
+        vector = first
+        for i, matrix in enumerate(powers):
+            if (k - 1) >> i & 1:
+                vector = vector_times(vector, matrix, k * m)
+        # valid if all the groups are done, or the last one ends with the record
+        done = vector[states.index((0, 0))]
+        last = vector[states.index((m - 1, groups[-1]))]
+        results.append((done[k * m] if len(done) > k * m else 0) +
+                       (last[k * m - 1] if len(last) > k * m - 1 else 0))
+    return results
 
 def get_possible_arrangement(r, state) -> DamagedRecord:
     assert not r.is_complete()
@@ -77,14 +329,14 @@ def apply_group(r) -> DamagedRecord:
     # what next? no clue
 
 
-def parse(data) -> List[DamagedRecord]:
-    records = []
-    for line in data.split("\n"):
-        record, groups = line.split()
-        parsed_groups = [int(g) for g in groups.split(",")]
-        records.append(DamagedRecord(record, parsed_groups))
+def parse_line(line) -> DamagedRecord:
+    record, groups = line.split()
+    parsed_groups = [int(g) for g in groups.split(",")]
+    return DamagedRecord(record, parsed_groups)
 
-    return records
+
+def parse(lines) -> Iterator[DamagedRecord]:
+    return (parse_line(line) for line in lines)
                          
 
 
@@ -100,21 +352,21 @@ def day12(filename, expected=None):
     """.strip()
 
 
-    test_records = parse(test_all_valid)
+    test_records = parse(test_all_valid.split("\n"))
     for t in test_records:
         assert t.is_complete(), t
         assert t.is_valid(), t
 
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    records = parse(data)
-    print(records)
+    records = parse(read_lines(filename))
+    total_records = 0
     total_count = 0
     for r in records:
+        total_records += 1
         count = possible_arrangements(r)
-        print(r, count)
+        if tracing.DEBUG:
+            tracing.event("day12.record", record=r.record, groups=r.groups, count=count)
         total_count += count
+    tracing.count("day12.records", total_records)
     result = total_count
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
@@ -122,29 +374,37 @@ def day12(filename, expected=None):
 
 
     print(f"Result: {result}")
+    return result
 
-def parse_part2(data) -> List[DamagedRecord]:
-    records = []
-    for line in data.split("\n"):
-        record, groups = line.split()
-        parsed_groups = [int(g) for g in groups.split(",")]
-        unfolded_groups = parsed_groups * 5
-        records.append(DamagedRecord("?".join([record for i in range(5)]), unfolded_groups))
+def parse_line_part2(line, factor=5) -> DamagedRecord:
+    record, groups = line.split()
+    parsed_groups = [int(g) for g in groups.split(",")]
+    unfolded_groups = parsed_groups * factor
+    return DamagedRecord("?".join([record for i in range(factor)]), unfolded_groups)
 
-    return records
 
-def day12_part2(filename, expected=None):
+def parse_part2(lines, factor=5) -> Iterator[DamagedRecord]:
+    return (parse_line_part2(line, factor) for line in lines)
+
 
-    with open(filename, "r") as f:
-        data = f.read().strip()
+def unfolded_totals(filename, factors: List[int]) -> List[int]:
+    "Sum of the arrangements of the records unfolded k times, for each k of factors"
+    totals = [0] * len(factors)
+    for r in parse(read_lines(filename)):
+        totals = list(map(add, totals, unfolded_arrangements(r.record, r.groups, factors)))
+    return totals
 
-    records = parse_part2(data)
-    print(records)
+def day12_part2(filename, expected=None):
+    records = parse_part2(read_lines(filename))
+    total_records = 0
     total_count = 0
     for r in records:
+        total_records += 1
         count = possible_arrangements(r)
-        print(r, count)
+        if tracing.DEBUG:
+            tracing.event("day12_part2.record", record=r.record, groups=r.groups, count=count)
         total_count += count
+    tracing.count("day12_part2.records", total_records)
     result = total_count
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
@@ -152,12 +412,38 @@ def day12_part2(filename, expected=None):
 
 
     print(f"Result: {result}")
+    return result
+
+EXAMPLE = """
+???.### 1,1,3
+.??..??...?##. 1,1,3
+?#?#?#?#?#?#?#? 1,3,1,6
+????.#...#... 4,1,1
+????.######..#####. 1,6,5
+?###???????? 3,2,1
+""".strip()
+
+
+def check_unfolded():
+    "The transfer matrices against counting the unfolded records directly"
+    for r, unfolded_5 in zip(parse(EXAMPLE.split("\n")), [1, 16384, 1, 16, 2500, 506250]):
+        factors = [1, 2, 5]
+        expected = [count_arrangements("?".join([r.record] * k), r.groups * k) for k in factors]
+        assert unfolded_arrangements(r.record, r.groups, factors) == expected, r
+        assert expected[-1] == unfolded_5, r
+
+def check_bit_record():
+    "BitRecord against count_arrangements, with a record too long to recurse over its groups"
+    for r in chain(parse(EXAMPLE.split("\n")), [parse_line_part2("???.### 1,1,3", 200)]):
+        assert BitRecord.from_record(r).count() == count_arrangements(r.record, r.groups), r
 
 if __name__ == "__main__":
     day12("day12_small.txt", expected=21)
     day12("day12.txt")
-    #day12_part2("day12_small.txt", expected=525152)
-    #day12_part2("day12.txt")
+    check_unfolded()
+    check_bit_record()
+    day12_part2("day12_small.txt", expected=525152)
+    day12_part2("day12.txt")
 
 
 # Start of problem:
@@ -182,3 +468,6 @@ if __name__ == "__main__":
 #
 # Smarter possible arrangements?
 # I think it's too late tonight.
+#
+# Counting instead of listing: the only thing that matters at a position is how many
+# groups are done and how long the current run is, count_arrangements carries that.
@@ -2,6 +2,8 @@
 
 from typing import List, Set, Tuple, Collection, Dict
 
+import tracing
+
 def parse_rocks(p) -> List[List[int]]: 
     rocks = []
     for l in p.split("\n"):
@@ -75,12 +77,13 @@ def day14(filename, expected=None):
         data = f.read().strip()
 
     rocks = parse_rocks(data)
-    print(pretty_rocks(rocks))
+    if tracing.DEBUG:
+        tracing.event("day14.rocks", rocks=pretty_rocks(rocks))
 
     new_rocks = tilt_rocks_north(rocks)
 
-    
-    print(pretty_rocks(new_rocks))
+    if tracing.DEBUG:
+        tracing.event("day14.tilted", rocks=pretty_rocks(new_rocks))
 
 
     result = total_load(new_rocks)
@@ -88,6 +91,7 @@ def day14(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 def load_at_cycle(rocks, count) -> int:
     "Brute force"
@@ -113,6 +117,7 @@ def load_at_cycle_prediction(rocks, count) -> int:
 
     interval = i - cycle_tl[rocks] 
     start = cycle_tl[rocks]
+    tracing.count("day14.cycles_simulated", i, cycle_start=start, interval=interval)
     # cut rock pattern at start of "cycle"
     rocks_patterns = rocks_patterns[start:]
     assert len(rocks_patterns) == interval
@@ -139,6 +144,7 @@ def day14_part2(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     #day14("day14_small.txt", expected=136)
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
-from typing import List, Set, Tuple, Collection, Dict
+from typing import Iterable, Iterator, List, Set, Tuple, Collection, Dict
 
-def parse(data) -> List[str]:
-    return data.split(",")
+import tracing
+from reader import read_tokens
+
+def parse(tokens: Iterable[str]) -> Iterator[str]:
+    "The initialization sequence, one step at a time, from the comma separated tokens as from read_tokens"
+    return (t.strip() for t in tokens if t.strip())
 
 def hash(input) -> int:
     current_val = 0
@@ -16,10 +20,7 @@ def hash(input) -> int:
 
 
 def day15(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    init_seq = parse(data)
+    init_seq = parse(read_tokens(filename, ","))
 
     total = 0
     for i in init_seq:
@@ -32,6 +33,7 @@ def day15(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 def lens_power(box_num, box) -> int:
     total = 0
@@ -50,12 +52,11 @@ def focusing_power(boxes) -> int:
 
 
 def day15_part2(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    init_seq = parse(data)
+    init_seq = parse(read_tokens(filename, ","))
     boxes = [[] for i in range(256)]
+    steps = 0
     for i in init_seq:
+        steps += 1
         if "=" in i:
             label = i.split("=")[0]
             box_id = hash(label)
@@ -81,12 +82,11 @@ def day15_part2(filename, expected=None):
         else:
             assert False, "Should not append"
 
-        # debugging
-        print("After \"{i}\"", i)
-        print([(f"Box {i}", b) for i, b in enumerate(boxes) if b])
-
-
+        if tracing.DEBUG:
+            tracing.event("day15_part2.step", step=i, box=box_id, lenses=box)
 
+    tracing.count("day15_part2.steps", steps)
+    tracing.count("day15_part2.lenses", sum(len(b) for b in boxes))
     total = focusing_power(boxes)
 
 
@@ -95,6 +95,7 @@ def day15_part2(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     #day15("day15_small.txt", expected=1320)
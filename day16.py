@@ -5,7 +5,8 @@ from typing import List, Set, Tuple, Collection, Dict
 from dataclasses import dataclass, field
 from enum import Enum, auto
 import copy
-import time
+
+import tracing
 
 EMPTY = "."
 RIGHT_TO_UP = "/"
@@ -176,17 +177,18 @@ def day16(filename, expected=None):
 
     cycle_unchanged = 0
     last_energized_count = 0
+    beams_processed = 0
     while beams:
         # take one beam
         beam = beams.pop()
+        beams_processed += 1
         new_beams = grid.process_beam(beam)
         # show the grid while solving it
-        #print(grid)
-        #print(new_beams)
+        if tracing.DEBUG:
+            tracing.event("day16.grid", grid=str(grid))
         # Make sure to process the new beams first
         new_beams.extend(beams)
         beams = new_beams
-        time.sleep(0.01)
         if grid.energized_count() == last_energized_count:
             cycle_unchanged += 1
         else:
@@ -198,21 +200,25 @@ def day16(filename, expected=None):
             print(f"No change detected for {cycle_unchanged} cycle, exiting")
             break
 
+    tracing.count("day16.beams_processed", beams_processed)
 
     result = grid.energized_count()
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 def count_energized(grid, start_beam) -> int:
     beams = [start_beam]
 
     cycle_unchanged = 0
     last_energized_count = 0
+    beams_processed = 0
     while beams:
         # take one beam
         beam = beams.pop()
+        beams_processed += 1
         new_beams = grid.process_beam(beam)
         # show the grid while solving it
         # print(grid)
@@ -232,6 +238,8 @@ def count_energized(grid, start_beam) -> int:
             # print(f"No change detected for {cycle_unchanged} cycle, exiting")
             break
 
+    if tracing.DEBUG:
+        tracing.event("day16.count_energized", start_beam=start_beam, beams_processed=beams_processed)
     result = grid.energized_count()
     return result
 
@@ -259,12 +267,13 @@ def day16_part2(filename, expected=None):
             max_start_beam = b
 
     result = max_energized
-    print("Max start beam", max_start_beam)
+    tracing.event("day16_part2.max_start_beam", start_beam=max_start_beam)
 
     if expected:
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     day16("day16_small.txt", expected=46)
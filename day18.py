@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 
-from typing import List, Set, Tuple, Collection, Dict
+from typing import Iterable, Iterator, List, Set, Tuple, Collection, Dict
 
 from dataclasses import dataclass
 
+import tracing
+from reader import read_lines
+
 @dataclass
 class DiggerStep:
     direction: str
@@ -96,14 +99,10 @@ def parse_line(line):
     direction, dist, color = line.split()
     return DiggerStep(direction, int(dist), color)
 
-def parse(data):
-    plan = []
-    for line in data.split("\n"):
-        ds = parse_line(line)
-        plan.append(ds)
-    return plan
+def parse(lines) -> Iterator[DiggerStep]:
+    return (parse_line(line) for line in lines)
 
-def get_points(start_pos: Point, plan: List[DiggerStep]) -> List[Point]:
+def get_points(start_pos: Point, plan: Iterable[DiggerStep]) -> List[Point]:
     all_points = [start_pos]
     for step in plan:
         start_pos, points = get_points_for_step(start_pos, step)
@@ -129,21 +128,20 @@ def get_points_for_step(start_pos: Point, step: DiggerStep) -> Tuple[Point, List
 
 
 def day18(filename, expected=None):
-    with open(filename, "r") as f:
-        data = f.read().strip()
-
-    plan = parse(data)
+    plan = parse(read_lines(filename))
 
     points = get_points(Point(0,0), plan)
 
-    print(points)
+    tracing.count("day18.trench", len(points))
     # Back to beginning
     assert(points[0] == points[-1])
     terrain = Terrain.from_points(set(points))
-    print(terrain)
+    if tracing.DEBUG:
+        tracing.event("day18.terrain", terrain=str(terrain))
 
     fill_points(terrain)
-    print(terrain)
+    if tracing.DEBUG:
+        tracing.event("day18.filled", terrain=str(terrain))
 
 
     result = terrain.lava_size()
@@ -151,6 +149,7 @@ def day18(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     day18("day18_small.txt", expected=62)
@@ -11,6 +11,7 @@ def dayXX(filename, expected=None):
         assert result == expected, f"expected {expected}, got {result}"
 
     print(f"Result: {result}")
+    return result
 
 if __name__ == "__main__":
     dayXX("dayXX_small.txt")
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+
+"""
+Seeded input generators, scalable by size, with the expected answers.
+
+    ./gen.py day11 --size 10000 --seed 1 --out-dir gen
+    ./run.py day11 --input-dir gen
+
+Writes gen/day11.txt and gen/day11_answers.json. The answers are either known
+by construction or computed by a reference written independently of the solvers,
+so the solvers can be load tested against them.
+
+day16_part2 is only answered up to size 100: the reference runs a breadth first
+search from each of the 4 * size edge tiles, O(size³) in all.
+"""
+
+import argparse
+import json
+import os
+import random
+from bisect import bisect_right
+from collections import deque
+from functools import reduce
+from math import lcm
+from typing import List, Set, Tuple, Collection, Dict
+
+
+# day02: size games
+
+def gen_day02(rng, size) -> Tuple[str, Dict]:
+    lines = []
+    id_sum = 0
+    power_sum = 0
+    for game_id in range(1, size + 1):
+        draws = []
+        maxes = {"red": 0, "green": 0, "blue": 0}
+        for _ in range(rng.randint(1, 6)):
+            colors = rng.sample(["red", "green", "blue"], rng.randint(1, 3))
+            draw = {c: rng.randint(1, 20) for c in colors}
+            for c, n in draw.items():
+                maxes[c] = max(maxes[c], n)
+            draws.append(", ".join(f"{n} {c}" for c, n in draw.items()))
+        lines.append(f"Game {game_id}: " + "; ".join(draws))
+        if maxes["red"] <= 12 and maxes["green"] <= 13 and maxes["blue"] <= 14:
+            id_sum += game_id
+        power_sum += maxes["red"] * maxes["green"] * maxes["blue"]
+    return "\n".join(lines), {"day02": [id_sum, power_sum]}
+
+
+# day05: size seeds, size mappings per layer
+
+LAYERS = ["seed", "soil", "fertilizer", "water", "light", "temperature", "humidity", "location"]
+
+
+def day05_layer(rng, size, span) -> List[Tuple[int, int, int]]:
+    "Disjoint source ranges with random destinations"
+    cuts = sorted(rng.sample(range(1, span), 2 * size))
+    layer = []
+    for start, end in zip(cuts[::2], cuts[1::2]):
+        layer.append((rng.randrange(0, span), start, end - start))
+    return layer
+
+
+def day05_reference_apply(layer, v) -> int:
+    "The layer is sorted by source"
+    i = bisect_right(layer, v, key=lambda m: m[1]) - 1
+    if i >= 0:
+        dest, src, length = layer[i]
+        if v < src + length:
+            return v - src + dest
+    return v
+
+
+def day05_reference_min(layers, boundaries, start, length) -> int:
+    "Walk the range one linear piece at a time, jumping to the next boundary of any layer"
+    best = None
+    x = start
+    while x < start + length:
+        stride = start + length - x
+        v = x
+        for layer, bounds in zip(layers, boundaries):
+            i = bisect_right(bounds, v)
+            if i < len(bounds):
+                stride = min(stride, bounds[i] - v)
+            v = day05_reference_apply(layer, v)
+        best = v if best is None else min(best, v)
+        x += stride
+    return best
+
+
+def gen_day05(rng, size) -> Tuple[str, Dict]:
+    span = 100 * size * size + 1000
+    layers = [sorted(day05_layer(rng, size, span), key=lambda m: m[1]) for _ in LAYERS[1:]]
+    seeds = []
+    for _ in range(size):
+        seeds.extend([rng.randrange(0, span), rng.randint(1, span // size)])
+
+    lines = ["seeds: " + " ".join(str(s) for s in seeds)]
+    for (source, dest), layer in zip(zip(LAYERS, LAYERS[1:]), layers):
+        shuffled = layer[:]
+        rng.shuffle(shuffled)
+        lines.append("")
+        lines.append(f"{source}-to-{dest} map:")
+        lines.extend(f"{d} {s} {n}" for d, s, n in shuffled)
+
+    part1 = min(reduce(lambda v, layer: day05_reference_apply(layer, v), layers, s) for s in seeds)
+    boundaries = [sorted({b for _, src, n in layer for b in (src, src + n)}) for layer in layers]
+    part2 = min(day05_reference_min(layers, boundaries, s, n) for s, n in zip(seeds[::2], seeds[1::2]))
+    return "\n".join(lines), {"day05": part1, "day05_part2": part2}
+
+
+# day06: size races
+
+def day06_reference(time, distance) -> int:
+    "Binary search the first winning charge below the peak, the wins are symmetric around it"
+    half = time // 2
+    if half * (time - half) <= distance:
+        return 0
+    lo, hi = 0, half
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid * (time - mid) > distance:
+            hi = mid
+        else:
+            lo = mid + 1
+    return time - 2 * lo + 1
+
+
+def gen_day06(rng, size) -> Tuple[str, Dict]:
+    times = [rng.randint(5, 100) for _ in range(size)]
+    distances = [rng.randint(1, t * t // 4 - 1) if t > 4 else 1 for t in times]
+    part1 = 1
+    for t, d in zip(times, distances):
+        part1 *= day06_reference(t, d)
+    part2 = day06_reference(int("".join(map(str, times))), int("".join(map(str, distances))))
+    text = ("Time: " + " ".join(map(str, times)) + "\n" +
+            "Distance: " + " ".join(map(str, distances)))
+    return text, {"day06": part1, "day06_part2": part2}
+
+
+# day08: 6 ghosts, each on a loop of about size nodes
+
+NAME_LETTERS = "BCDEFGHIJKLMNOPQRSTUVWXY" # never A or Z, those mark the starts and ends
+
+
+def day08_names(count) -> List[str]:
+    width = 3
+    while len(NAME_LETTERS) ** width < count:
+        width += 1
+    names = []
+    for i in range(count):
+        name = ""
+        for _ in range(width):
+            i, r = divmod(i, len(NAME_LETTERS))
+            name += NAME_LETTERS[r]
+        names.append(name)
+    return names
+
+
+def gen_day08(rng, size, ghosts=6) -> Tuple[str, Dict]:
+    """
+    Each ghost walks from its A node along two lanes, left or right, to its Z node
+    and from there back to the start of the lanes, so it's on Z every loop length steps.
+    """
+    directions = "".join(rng.choice("LR") for _ in range(max(1, size // 10)))
+    lengths = [rng.randint(max(2, size // 2), max(2, size)) for _ in range(ghosts)]
+    names = iter(day08_names(sum(2 * (n - 1) for n in lengths)))
+    nodes = {}
+    for g, n in enumerate(lengths):
+        start = "AAA" if g == 0 else f"G{g}A"
+        end = "ZZZ" if g == 0 else f"G{g}Z"
+        lanes = [[next(names) for _ in range(n - 1)] for _ in range(2)]
+        first = (lanes[0][0], lanes[1][0])
+        nodes[start] = first
+        nodes[end] = first
+        for j in range(n - 1):
+            nxt = (lanes[0][j + 1], lanes[1][j + 1]) if j + 2 < n else (end, end)
+            nodes[lanes[0][j]] = nxt
+            nodes[lanes[1][j]] = nxt
+
+    lines = [f"{k} = ({l}, {r})" for k, (l, r) in nodes.items()]
+    rng.shuffle(lines)
+    return directions + "\n\n" + "\n".join(lines), {"day08": lengths[0], "day08_part2": lcm(*lengths)}
+
+
+# day09: size histories of 21 values
+
+def binomial(t, j) -> int:
+    "Binomial coefficient, also for negative t"
+    result = 1
+    for i in range(j):
+        result = result * (t - i) // (i + 1)
+    return result
+
+
+def gen_day09(rng, size, length=21) -> Tuple[str, Dict]:
+    lines = []
+    part1 = part2 = 0
+    for _ in range(size):
+        # Newton coefficients of a polynomial of random degree
+        coefs = [rng.randint(-20, 20) for _ in range(rng.randint(1, length - 1))]
+        value = lambda t: sum(c * binomial(t, j) for j, c in enumerate(coefs))
+        lines.append(" ".join(str(value(t)) for t in range(length)))
+        part1 += value(length)
+        part2 += value(-1)
+    return "\n".join(lines), {"day09": part1, "day09_part2": part2}
+
+
+# day10: size x size pipe maps
+
+def column_convex_shape(rng, width, height) -> Tuple[List[int], List[int]]:
+    "Each column spans [lo, hi), overlapping the previous column so the boundary is a simple loop"
+    lo = [rng.randrange(0, height - 1)]
+    hi = [rng.randint(lo[0] + 1, height)]
+    for _ in range(width - 1):
+        l = rng.randrange(0, hi[-1])
+        h = rng.randint(max(l, lo[-1]) + 1, height)
+        lo.append(l)
+        hi.append(h)
+    return lo, hi
+
+
+def shape_outline(lo, hi) -> List[Tuple[int, int]]:
+    "Corners of the outline, clockwise from the top left"
+    width = len(lo)
+    points = [(0, lo[0])]
+    for x in range(width):
+        points.append((x + 1, lo[x]))
+        if x + 1 < width and lo[x + 1] != lo[x]:
+            points.append((x + 1, lo[x + 1]))
+    points.append((width, hi[-1]))
+    for x in range(width - 1, -1, -1):
+        points.append((x, hi[x]))
+        if x > 0 and hi[x - 1] != hi[x]:
+            points.append((x, hi[x - 1]))
+    return points # back to (0, lo[0]) implied
+
+
+PIPE_FOR_DIRECTIONS = {
+    frozenset([(0, -1), (0, 1)]): "|",
+    frozenset([(1, 0), (-1, 0)]): "-",
+    frozenset([(0, -1), (1, 0)]): "L",
+    frozenset([(0, -1), (-1, 0)]): "J",
+    frozenset([(0, 1), (-1, 0)]): "7",
+    frozenset([(0, 1), (1, 0)]): "F",
+}
+
+
+def sign(v) -> int:
+    return (v > 0) - (v < 0)
+
+
+def gen_day10(rng, size) -> Tuple[str, Dict]:
+    lo, hi = column_convex_shape(rng, size - 2, size - 2)
+    corners = shape_outline(lo, hi)
+    # every tile of the loop, offset by 1 to leave an outside ring
+    loop = []
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+        dx, dy = sign(x2 - x1), sign(y2 - y1)
+        for i in range(abs(x2 - x1) + abs(y2 - y1)):
+            loop.append((x1 + 1 + i * dx, y1 + 1 + i * dy))
+
+    grid = [[rng.choice(".|-LJ7F") for _ in range(size)] for _ in range(size)]
+    for i, (x, y) in enumerate(loop):
+        px, py = loop[i - 1]
+        nx, ny = loop[(i + 1) % len(loop)]
+        grid[y][x] = PIPE_FOR_DIRECTIONS[frozenset([(px - x, py - y), (nx - x, ny - y)])]
+    sx, sy = rng.choice(loop)
+    grid[sy][sx] = "S"
+    # the start must only be connected to the loop
+    on_loop = set(loop)
+    for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+        if (sx + dx, sy + dy) not in on_loop and 0 <= sx + dx < size and 0 <= sy + dy < size:
+            grid[sy + dy][sx + dx] = "."
+
+    # Pick's theorem, the area is the number of cells of the shape
+    area = sum(h - l for l, h in zip(lo, hi))
+    enclosed = area - len(loop) // 2 + 1
+    return "\n".join("".join(r) for r in grid), {"day10": len(loop) // 2, "day10_part2": enclosed}
+
+
+# day11: size x size image with about 2% galaxies
+
+def day11_reference(positions, length, factor) -> int:
+    "Each column between two galaxies is crossed by every pair around it"
+    count = [0] * length
+    for p in positions:
+        count[p] += 1
+    total = 0
+    left = 0
+    for c in range(length):
+        left += count[c]
+        width = 1 if count[c] else factor
+        total += width * left * (len(positions) - left)
+    return total
+
+
+def gen_day11(rng, size, density=0.02) -> Tuple[str, Dict]:
+    # keep some rows and columns empty
+    rows = [r for r in range(size) if rng.random() > 0.1]
+    cols = [c for c in range(size) if rng.random() > 0.1]
+    galaxies = {(rng.choice(cols), rng.choice(rows)) for _ in range(max(2, int(size * size * density)))}
+    image = [["."] * size for _ in range(size)]
+    for x, y in galaxies:
+        image[y][x] = "#"
+
+    xs = [x for x, _ in galaxies]
+    ys = [y for _, y in galaxies]
+    answer = lambda f: day11_reference(xs, size, f) + day11_reference(ys, size, f)
+    answers = {"day11": answer(2), "day11_part2": answer(1000000)}
+    for f in [10, 100]:
+        answers[f"day11_part2_factor_{f}"] = answer(f)
+    return "\n".join("".join(r) for r in image), answers
+
+
+# day12: size records
+
+def day12_reference(record, groups) -> int:
+    "Run the record through the automaton of the pattern .*#{g1}.+#{g2}...#{gn}.*"
+    pattern = "." + ".".join("#" * g for g in groups) + "."
+    counts = {0: 1}
+    for c in record:
+        new_counts = {}
+        for state, n in counts.items():
+            for ch in ".#" if c == "?" else c:
+                if state + 1 < len(pattern) and pattern[state + 1] == ch:
+                    new_counts[state + 1] = new_counts.get(state + 1, 0) + n
+                if pattern[state] == "." and ch == ".":
+                    new_counts[state] = new_counts.get(state, 0) + n
+        counts = new_counts
+    return counts.get(len(pattern) - 1, 0) + counts.get(len(pattern) - 2, 0)
+
+
+def gen_day12(rng, size) -> Tuple[str, Dict]:
+    lines = []
+    part1 = part2 = 0
+    for _ in range(size):
+        record = "".join(rng.choice("..#") for _ in range(rng.randint(5, 20)))
+        if "#" not in record:
+            record = "#" + record[1:]
+        groups = [len(g) for g in record.split(".") if g]
+        record = "".join("?" if rng.random() < 0.4 else c for c in record)
+        lines.append(f"{record} {','.join(map(str, groups))}")
+        part1 += day12_reference(record, groups)
+        part2 += day12_reference("?".join([record] * 5), groups * 5)
+    return "\n".join(lines), {"day12": part1, "day12_part2": part2}
+
+
+# day14: size x size platforms
+
+def gen_day14(rng, size) -> Tuple[str, Dict]:
+    grid = ["".join(rng.choice("OO#.....") for _ in range(size)) for _ in range(size)]
+    load = 0
+    for x in range(size):
+        free = 0 # first row a rolling rock can reach
+        for y in range(size):
+            if grid[y][x] == "#":
+                free = y + 1
+            elif grid[y][x] == "O":
+                load += size - free
+                free += 1
+    return "\n".join(grid), {"day14": load, "day14_part2": day14_reference_cycles(grid, 10**9)}
+
+
+def day14_tilt_north(grid: List[List[str]]):
+    for x in range(len(grid[0])):
+        free = 0
+        for y in range(len(grid)):
+            if grid[y][x] == "#":
+                free = y + 1
+            elif grid[y][x] == "O":
+                grid[y][x] = "."
+                grid[free][x] = "O"
+                free += 1
+
+
+def day14_reference_cycles(rows: List[str], count) -> int:
+    """
+    North load after count spin cycles. Each tilt is a north tilt of the platform
+    turned clockwise, the states are hashed until one comes back, then the period
+    skips to the end.
+    """
+    grid = [list(r) for r in rows]
+    seen = {}
+    loads = []
+    for i in range(count):
+        for _ in range(4):
+            day14_tilt_north(grid)
+            grid = [list(r) for r in zip(*grid[::-1])] # clockwise
+        state = "".join("".join(r) for r in grid)
+        if state in seen:
+            start = seen[state]
+            return loads[start + (count - 1 - start) % (i - start)]
+        seen[state] = i
+        loads.append(sum(len(grid) - y for y, r in enumerate(grid) for c in r if c == "O"))
+    return loads[-1]
+
+
+# day16: size x size contraptions
+
+DEFLECT = {
+    ("/", (1, 0)): [(0, -1)], ("/", (-1, 0)): [(0, 1)], ("/", (0, 1)): [(-1, 0)], ("/", (0, -1)): [(1, 0)],
+    ("\\", (1, 0)): [(0, 1)], ("\\", (-1, 0)): [(0, -1)], ("\\", (0, 1)): [(1, 0)], ("\\", (0, -1)): [(-1, 0)],
+    ("|", (1, 0)): [(0, -1), (0, 1)], ("|", (-1, 0)): [(0, -1), (0, 1)],
+    ("-", (0, 1)): [(-1, 0), (1, 0)], ("-", (0, -1)): [(-1, 0), (1, 0)],
+}
+
+
+def day16_reference(grid, x, y, dx, dy) -> int:
+    "Breadth first over (x, y, direction)"
+    seen = {(x, y, dx, dy)}
+    queue = deque(seen)
+    while queue:
+        x, y, dx, dy = queue.popleft()
+        for ndx, ndy in DEFLECT.get((grid[y][x], (dx, dy)), [(dx, dy)]):
+            state = (x + ndx, y + ndy, ndx, ndy)
+            if 0 <= state[0] < len(grid[0]) and 0 <= state[1] < len(grid) and state not in seen:
+                seen.add(state)
+                queue.append(state)
+    return len({(x, y) for x, y, _, _ in seen})
+
+
+def gen_day16(rng, size) -> Tuple[str, Dict]:
+    grid = ["".join(rng.choice("/\\|-" + "." * 16) for _ in range(size)) for _ in range(size)]
+    answers = {"day16": day16_reference(grid, 0, 0, 1, 0)}
+    if size <= 100:
+        starts = ([(0, y, 1, 0) for y in range(size)] + [(size - 1, y, -1, 0) for y in range(size)] +
+                  [(x, 0, 0, 1) for x in range(size)] + [(x, size - 1, 0, -1) for x in range(size)])
+        answers["day16_part2"] = max(day16_reference(grid, *s) for s in starts)
+    return "\n".join(grid), answers
+
+
+# day18: a dig plan of about 4 * size steps
+
+def gen_day18(rng, size) -> Tuple[str, Dict]:
+    lo, hi = column_convex_shape(rng, size, size)
+    # stretch the columns and rows so the steps are longer than 1
+    xs = [0]
+    for _ in range(size):
+        xs.append(xs[-1] + rng.randint(1, 10))
+    ys = [0]
+    for _ in range(size):
+        ys.append(ys[-1] + rng.randint(1, 10))
+    corners = [(xs[x], ys[y]) for x, y in shape_outline(lo, hi)]
+    x0, y0 = corners[0]
+    corners = [(x - x0, y - y0) for x, y in corners]
+
+    lines = []
+    perimeter = 0
+    area2 = 0
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+        dist = abs(x2 - x1) + abs(y2 - y1)
+        direction = {(1, 0): "R", (-1, 0): "L", (0, 1): "D", (0, -1): "U"}[(sign(x2 - x1), sign(y2 - y1))]
+        lines.append(f"{direction} {dist} (#{rng.randrange(16**6):06x})")
+        perimeter += dist
+        area2 += x1 * y2 - x2 * y1
+    # shoelace for the inside of the trench, plus the half of the trench outside it
+    return "\n".join(lines), {"day18": abs(area2) // 2 + perimeter // 2 + 1}
+
+
+# day15: size steps
+
+def day15_reference_hash(s) -> int:
+    return reduce(lambda v, c: (v + ord(c)) * 17 % 256, s, 0)
+
+
+def gen_day15(rng, size) -> Tuple[str, Dict]:
+    labels = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 6)))
+              for _ in range(max(1, size // 5))]
+    steps = []
+    boxes = [dict() for _ in range(256)] # dicts keep the insertion order, like the lenses
+    for _ in range(size):
+        label = rng.choice(labels)
+        box = boxes[day15_reference_hash(label)]
+        if rng.random() < 0.3:
+            steps.append(f"{label}-")
+            box.pop(label, None)
+        else:
+            focal = rng.randint(1, 9)
+            steps.append(f"{label}={focal}")
+            box[label] = focal
+    part1 = sum(day15_reference_hash(s) for s in steps)
+    part2 = sum(b * slot * focal
+                for b, box in enumerate(boxes, 1)
+                for slot, focal in enumerate(box.values(), 1))
+    return ",".join(steps), {"day15": part1, "day15_part2": part2}
+
+
+GENERATORS = {
+    "day02": gen_day02,
+    "day05": gen_day05,
+    "day06": gen_day06,
+    "day08": gen_day08,
+    "day09": gen_day09,
+    "day10": gen_day10,
+    "day11": gen_day11,
+    "day12": gen_day12,
+    "day14": gen_day14,
+    "day15": gen_day15,
+    "day16": gen_day16,
+    "day18": gen_day18,
+}
+
+
+def generate(day, size, seed=0) -> Tuple[str, Dict]:
+    "Input text and expected answers, keyed by solver name"
+    return GENERATORS[day](random.Random(seed), size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate inputs with known answers")
+    parser.add_argument("days", nargs="*", help=f"days to generate (default: all of {', '.join(GENERATORS)})")
+    parser.add_argument("--size", type=int, default=100, help="scale of the input, see each generator")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="gen")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for day in args.days or GENERATORS:
+        text, answers = generate(day, args.size, args.seed)
+        with open(os.path.join(args.out_dir, f"{day}.txt"), "w") as f:
+            f.write(text + "\n")
+        with open(os.path.join(args.out_dir, f"{day}_answers.json"), "w") as f:
+            json.dump(answers, f, indent=2)
+        print(day, answers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+Map-reduce over the independent items of an input, on every core.
+
+    ./mapreduce.py day12 day12.txt
+    ./mapreduce.py day09_part2 day09.txt -j 8
+
+The file is cut in byte ranges aligned on the item separator, each worker
+streams its range, applies the per item function and sums, and the partial
+sums are added together. Nothing but the byte offsets is sent to the workers.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from typing import Callable, Iterator, List, Set, Tuple, Collection, Dict
+
+import day02
+import day09
+import day12
+import day15
+
+BLOCK_SIZE = 1 << 16
+
+
+def split_file(filename, parts, sep=b"\n") -> List[Tuple[int, int]]:
+    "Byte ranges [start, end) of about the same size, each ending right after a separator"
+    size = os.path.getsize(filename)
+    bounds = [0]
+    with open(filename, "rb") as f:
+        for i in range(1, parts):
+            pos = max(size * i // parts, bounds[-1])
+            f.seek(pos)
+            # move to the end of the item cut by pos
+            while True:
+                block = f.read(BLOCK_SIZE)
+                if not block:
+                    pos = size
+                    break
+                found = block.find(sep)
+                if found >= 0:
+                    pos += found + len(sep)
+                    break
+                pos += len(block)
+            bounds.append(pos)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def read_items(filename, start, end, sep=b"\n") -> Iterator[str]:
+    "The items in the byte range, streamed by blocks"
+    with open(filename, "rb") as f:
+        f.seek(start)
+        rest = b""
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            items = (rest + block).split(sep)
+            rest = items.pop()
+            for item in items:
+                item = item.strip()
+                if item:
+                    yield item.decode()
+        rest = rest.strip()
+        if rest:
+            yield rest.decode()
+
+
+def add(a, b):
+    "Sum of numbers or, element by element, of tuples"
+    if isinstance(a, tuple):
+        return tuple(x + y for x, y in zip(a, b))
+    return a + b
+
+
+def map_chunk(filename, start, end, func, sep, initial):
+    return reduce(add, map(func, read_items(filename, start, end, sep)), initial)
+
+
+def map_reduce(filename, func: Callable, sep=b"\n", workers=None, initial=0, parts_per_worker=4):
+    """
+    Sum of func over every item of the file. func must be a module level function,
+    so it can be sent to the workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_file(filename, workers * parts_per_worker, sep)
+    if workers == 1:
+        partials = [map_chunk(filename, start, end, func, sep, initial) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(map_chunk, filename, start, end, func, sep, initial) for start, end in ranges]
+            partials = [f.result() for f in futures]
+    return reduce(add, partials, initial)
+
+
+# Per item functions of the solvers
+
+BAG = day02.CubeSet(red=12, blue=14, green=13)
+
+
+def day02_game(line) -> Tuple[int, int]:
+    "(id if possible, power)"
+    game = day02.parse(line)
+    return (game.id if game.possible_cube_set(BAG) else 0, game.power())
+
+
+def day09_next(line) -> int:
+    return day09.predict_next_elem(day09.parse_line(line))
+
+
+def day09_previous(line) -> int:
+    return day09.predict_previous_elem(day09.parse_line(line))
+
+
+def day12_arrangements(line) -> int:
+    return day12.possible_arrangements(day12.parse_line(line))
+
+
+def day12_arrangements_part2(line) -> int:
+    return day12.possible_arrangements(day12.parse_line_part2(line))
+
+
+def day15_hash(token) -> int:
+    return sum(map(day15.hash, day15.parse([token])))
+
+
+JOBS = {
+    # name: (function, separator, initial value)
+    "day02": (day02_game, b"\n", (0, 0)),
+    "day09": (day09_next, b"\n", 0),
+    "day09_part2": (day09_previous, b"\n", 0),
+    "day12": (day12_arrangements, b"\n", 0),
+    "day12_part2": (day12_arrangements_part2, b"\n", 0),
+    "day15": (day15_hash, b",", 0),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map-reduce a solver over the items of its input")
+    parser.add_argument("job", choices=JOBS)
+    parser.add_argument("filename")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    func, sep, initial = JOBS[args.job]
+    start = time.perf_counter()
+    result = map_reduce(args.filename, func, sep, args.jobs, initial)
+    print(f"Result: {result}")
+    print(f"Time: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+"""
+Piecewise shifts of the integers, what the day05 maps are.
+
+A function is kept as (bounds, offsets): piece k covers [bounds[k-1], bounds[k])
+and adds offsets[k] to anything in it. The first and last pieces are unbounded
+and, for the day05 maps, always have an offset of 0. Neighbouring pieces never
+have the same offset, so the breakpoints are exactly where the function jumps.
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from math import inf
+from typing import Iterable, Iterator, List, Set, Tuple, Collection, Dict
+
+Pieces = Tuple[List[int], List[int]]
+
+IDENTITY: Pieces = ([], [0])
+
+
+def normalize(bounds, offsets) -> Pieces:
+    "Merge the neighbouring pieces with the same offset"
+    new_bounds = []
+    new_offsets = [offsets[0]]
+    for b, o in zip(bounds, offsets[1:]):
+        if o != new_offsets[-1]:
+            new_bounds.append(b)
+            new_offsets.append(o)
+    return new_bounds, new_offsets
+
+
+def from_intervals(intervals: Iterable[Tuple[int, int, int]]) -> Pieces:
+    "From disjoint (start, end, offset), end excluded, the rest of the integers are left as is"
+    bounds = []
+    offsets = [0]
+    for start, end, offset in sorted(intervals):
+        if bounds and bounds[-1] == start:
+            # adjacent to the previous interval, no gap in between
+            offsets[-1] = offset
+        else:
+            assert not bounds or bounds[-1] < start, f"Overlapping intervals at {start}"
+            bounds.append(start)
+            offsets.append(offset)
+        bounds.append(end)
+        offsets.append(0)
+    return normalize(bounds, offsets)
+
+
+def to_intervals(pieces: Pieces) -> Iterator[Tuple[int, int, int]]:
+    "(start, end, offset) of the bounded pieces that move something"
+    bounds, offsets = pieces
+    for k in range(1, len(bounds)):
+        if offsets[k]:
+            yield bounds[k - 1], bounds[k], offsets[k]
+
+
+def apply(pieces: Pieces, x: int) -> int:
+    bounds, offsets = pieces
+    return x + offsets[bisect_right(bounds, x)]
+
+
+def compose(first: Pieces, second: Pieces) -> Pieces:
+    "x -> second(first(x)), cutting the pieces of first where their image crosses a bound of second"
+    b1, o1 = first
+    b2, o2 = second
+    bounds = []
+    offsets = []
+    for k, off in enumerate(o1):
+        lo = b1[k - 1] if k > 0 else None
+        hi = b1[k] if k < len(b1) else None
+        # piece of second where the image starts, and the bounds of second inside the image
+        i = bisect_right(b2, lo + off) if lo is not None else 0
+        j = bisect_left(b2, hi + off) if hi is not None else len(b2)
+        for cut in b2[i:j]:
+            offsets.append(off + o2[i])
+            bounds.append(cut - off)
+            i += 1
+        offsets.append(off + o2[i])
+        if hi is not None:
+            bounds.append(hi)
+    return normalize(bounds, offsets)
+
+
+def compose_all(chain: Iterable[Pieces]) -> Pieces:
+    "The whole chain as one function, applying the first one first"
+    result = IDENTITY
+    for pieces in chain:
+        result = compose(result, pieces)
+    return result
+
+
+def min_over(pieces: Pieces, start: int, end: int) -> int:
+    """
+    Minimum of the function over [start, end). Each piece is increasing,
+    so it can only be at start or at one of the breakpoints inside.
+    """
+    bounds, offsets = pieces
+    k = bisect_right(bounds, start)
+    best = start + offsets[k]
+    while k < len(bounds) and bounds[k] < end:
+        best = min(best, bounds[k] + offsets[k + 1])
+        k += 1
+    return best
+
+
+@dataclass
+class Inverse:
+    """
+    The pieces sorted by the start of their image, to go back from a result to
+    what gives it. The images can overlap, so max_end is a segment tree over
+    them: max_end[size + i] is the image end of piece i, and each node has the
+    largest end below it. A query only goes down the nodes with an image ending
+    inside the window, so it costs O((answers + 1) log n). The unbounded pieces
+    use -inf and inf.
+    """
+    starts: List[int]
+    ends: List[int]
+    offsets: List[int]
+    size: int
+    max_end: List[int]
+
+
+def invert(pieces: Pieces) -> Inverse:
+    bounds, offsets = pieces
+    edges = [-inf] + bounds + [inf]
+    images = sorted((lo + off, hi + off, off) for lo, hi, off in zip(edges, edges[1:], offsets))
+    size = 1
+    while size < len(images):
+        size *= 2
+    max_end = [-inf] * (2 * size)
+    for i, (_, end, _) in enumerate(images):
+        max_end[size + i] = end
+    for node in range(size - 1, 0, -1):
+        max_end[node] = max(max_end[2 * node], max_end[2 * node + 1])
+    return Inverse([i[0] for i in images], [i[1] for i in images], [i[2] for i in images], size, max_end)
+
+
+def preimage(inverse: Inverse, start: int, end: int) -> List[Tuple[int, int]]:
+    "The [start, end) ranges, unsorted, sent inside [start, end)"
+    result = []
+    # only the pieces with an image starting before end, and ending after start
+    count = bisect_left(inverse.starts, end)
+    stack = [(1, 0, inverse.size)]
+    while stack:
+        node, lo, hi = stack.pop()
+        if lo >= count or inverse.max_end[node] <= start:
+            continue
+        if node >= inverse.size:
+            off = inverse.offsets[lo]
+            result.append((max(start, inverse.starts[lo]) - off, min(end, inverse.ends[lo]) - off))
+            continue
+        mid = (lo + hi) // 2
+        stack.append((2 * node, lo, mid))
+        stack.append((2 * node + 1, mid, hi))
+    return result
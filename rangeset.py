@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""
+Set of integers kept as sorted, disjoint and coalesced ranges.
+
+Ranges are half open, [start, end), and stored in two parallel lists of
+Python ints, so the values can be any size, like the day05 generated inputs.
+Overlapping or touching ranges are always merged, so the set stays as small
+as it can be.
+"""
+
+from bisect import bisect_right
+from heapq import merge
+from typing import Iterable, Iterator, List, Set, Tuple, Collection, Dict
+
+
+class RangeSet:
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = ()):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self._extend_sorted(sorted(ranges))
+
+    @staticmethod
+    def _from_sorted(ranges: Iterable[Tuple[int, int]]) -> "RangeSet":
+        "Skip the sort when the ranges come sorted by start"
+        rs = RangeSet()
+        rs._extend_sorted(ranges)
+        return rs
+
+    def _extend_sorted(self, ranges: Iterable[Tuple[int, int]]):
+        starts = self.starts
+        ends = self.ends
+        for start, end in ranges:
+            if end <= start:
+                continue
+            if ends and start <= ends[-1]:
+                # overlapping or touching the last one
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.starts, self.ends)
+
+    def __len__(self) -> int:
+        "Number of ranges, see size for the number of integers"
+        return len(self.starts)
+
+    def __bool__(self) -> bool:
+        return len(self.starts) > 0
+
+    def __contains__(self, x: int) -> bool:
+        i = bisect_right(self.starts, x) - 1
+        return i >= 0 and x < self.ends[i]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RangeSet) and self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self) -> str:
+        return f"RangeSet({list(self)})"
+
+    def size(self) -> int:
+        return sum(self.ends) - sum(self.starts)
+
+    def min(self) -> int:
+        return self.starts[0]
+
+    def max(self) -> int:
+        "Largest integer in the set, the end is excluded"
+        return self.ends[-1] - 1
+
+    def union(self, other: "RangeSet") -> "RangeSet":
+        return RangeSet._from_sorted(merge(self, other))
+
+    def intersection(self, other: "RangeSet") -> "RangeSet":
+        result = RangeSet()
+        i = j = 0
+        while i < len(self) and j < len(other):
+            start = max(self.starts[i], other.starts[j])
+            end = min(self.ends[i], other.ends[j])
+            if start < end:
+                result.starts.append(start)
+                result.ends.append(end)
+            # drop the one ending first, it can't overlap anything else
+            if self.ends[i] < other.ends[j]:
+                i += 1
+            else:
+                j += 1
+        return result
+
+    def difference(self, other: "RangeSet") -> "RangeSet":
+        result = RangeSet()
+        j = 0
+        for start, end in self:
+            while j < len(other) and other.ends[j] <= start:
+                j += 1
+            k = j
+            while k < len(other) and other.starts[k] < end:
+                if other.starts[k] > start:
+                    result.starts.append(start)
+                    result.ends.append(other.starts[k])
+                start = max(start, other.ends[k])
+                k += 1
+            if start < end:
+                result.starts.append(start)
+                result.ends.append(end)
+        return result
+
+    def offset(self, delta: int) -> "RangeSet":
+        result = RangeSet()
+        result.starts = [s + delta for s in self.starts]
+        result.ends = [e + delta for e in self.ends]
+        return result
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+"""
+Streaming input readers, in place of f.read().strip().split(...).
+
+Everything is a generator holding at most one line, token or chunk,
+so the inputs can be bigger than the memory.
+"""
+
+from typing import Iterator, List, Set, Tuple, Collection, Dict
+
+BLOCK_SIZE = 1 << 16
+
+
+def read_lines(filename) -> Iterator[str]:
+    "Non blank lines, without the line ending"
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.rstrip()
+            if line:
+                yield line
+
+
+def read_tokens(filename, sep=",", block_size=BLOCK_SIZE) -> Iterator[str]:
+    "Tokens separated by sep, read by blocks since the whole file can be a single line"
+    with open(filename, "r") as f:
+        rest = ""
+        while block := f.read(block_size):
+            tokens = (rest + block).split(sep)
+            # the last token can continue in the next block
+            rest = tokens.pop()
+            for t in tokens:
+                t = t.strip()
+                if t:
+                    yield t
+        rest = rest.strip()
+        if rest:
+            yield rest
+
+
+def read_chunks(filename) -> Iterator[str]:
+    "Blocks of lines separated by blank lines, each joined back with \\n"
+    chunk: List[str] = []
+    with open(filename, "r") as f:
+        for line in f:
+            line = line.rstrip()
+            if line:
+                chunk.append(line)
+            elif chunk:
+                yield "\n".join(chunk)
+                chunk = []
+    if chunk:
+        yield "\n".join(chunk)
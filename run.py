@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+Run every dayXX / dayXX_part2 solver, time it and report the result.
+
+    ./run.py                  # every solver on the full inputs
+    ./run.py --small          # every solver on the examples, checking the expected values
+    ./run.py day11 day05_v2   # only some modules
+    ./run.py -j 1             # one at a time, no process pool
+
+Solvers are independent, so they are fanned out over a process pool and
+the whole run takes about as long as the slowest one.
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Set, Tuple, Collection, Dict
+
+MODULE_PATTERN = "day[0-9][0-9]*.py"
+SOLVER_RE = re.compile(r"^day\d\d(_part2)?$")
+
+# Arguments for the full inputs, when a solver needs more than a filename
+FULL_ARGS = {
+    "day11_part2": {"factor": 1000000},
+}
+
+# Example inputs and their expected values, taken from the puzzle descriptions
+SMALL_INPUTS = {
+    "day08_part2": "day08_small_part_2.txt",
+    "day10_part2": "day10_part2_small.txt",
+}
+SMALL_ARGS = {
+    "day02": {"expected": 8},
+    "day05": {"expected": 35},
+    "day05_part2": {"expected": 46},
+    "day06": {"expected": 288},
+    "day06_part2": {"expected": 71503},
+    "day08": {"expected": 2},
+    "day08_part2": {"expected": 6},
+    "day09": {"expected": 114},
+    "day09_part2": {"expected": 2},
+    "day10": {"expected": 8},
+    "day10_part2": {"expected": 4},
+    "day11": {"expected": 374},
+    "day11_part2": {"factor": 100, "expected": 8410},
+    "day12": {"expected": 21},
+    "day12_part2": {"expected": 525152},
+    "day14": {"expected": 136},
+    "day14_part2": {"expected": 64},
+    "day15": {"expected": 1320},
+    "day15_part2": {"expected": 145},
+    "day16": {"expected": 46},
+    "day16_part2": {"expected": 51},
+    "day18": {"expected": 62},
+}
+
+
+@dataclass
+class Job:
+    module: str
+    solver: str
+    filename: str
+    kwargs: Dict
+
+    @property
+    def name(self) -> str:
+        return f"{self.module}.{self.solver}"
+
+
+@dataclass
+class Outcome:
+    job: Job
+    wall: float = 0.0
+    cpu: float = 0.0
+    result: object = None
+    error: str | None = None
+
+
+def find_modules() -> List[str]:
+    return sorted(os.path.splitext(os.path.basename(p))[0]
+                  for p in glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), MODULE_PATTERN)))
+
+
+def find_solvers(module_name) -> List[str]:
+    module = importlib.import_module(module_name)
+    return sorted(name for name in dir(module)
+                  if SOLVER_RE.match(name) and callable(getattr(module, name)))
+
+
+def input_file(solver, small, input_dir) -> str:
+    day = solver.split("_")[0]
+    if small:
+        filename = SMALL_INPUTS.get(solver, f"{day}_small.txt")
+    else:
+        filename = f"{day}.txt"
+    return os.path.join(input_dir, filename)
+
+
+def make_jobs(modules, small, input_dir) -> List[Job]:
+    jobs = []
+    for module in modules:
+        for solver in find_solvers(module):
+            kwargs = (SMALL_ARGS if small else FULL_ARGS).get(solver, {})
+            jobs.append(Job(module, solver, input_file(solver, small, input_dir), kwargs))
+    return jobs
+
+
+def run_job(job: Job) -> Outcome:
+    "Run one solver with its output silenced, this is what runs in the pool"
+    outcome = Outcome(job)
+    if not os.path.exists(job.filename):
+        outcome.error = f"missing input {job.filename}"
+        return outcome
+
+    solver = getattr(importlib.import_module(job.module), job.solver)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            outcome.result = solver(job.filename, **job.kwargs)
+    except Exception as e:
+        outcome.error = f"{type(e).__name__}: {e}"
+    outcome.wall = time.perf_counter() - wall_start
+    outcome.cpu = time.process_time() - cpu_start
+    return outcome
+
+
+def run_jobs(jobs: List[Job], workers: int | None) -> List[Outcome]:
+    if workers == 1:
+        return [run_job(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, j) for j in jobs]
+        return [f.result() for f in as_completed(futures)]
+
+
+def report(outcomes: List[Outcome], total_wall: float):
+    width = max([len(o.job.name) for o in outcomes] + [len("solver")])
+    print(f"{'solver':<{width}}  {'wall (s)':>9}  {'cpu (s)':>9}  result")
+    for o in sorted(outcomes, key=lambda o: o.job.name):
+        result = o.error if o.error else o.result
+        print(f"{o.job.name:<{width}}  {o.wall:9.3f}  {o.cpu:9.3f}  {result}")
+    failed = [o for o in outcomes if o.error and not o.error.startswith("missing input")]
+    print(f"{len(outcomes)} solvers, {len(failed)} failed, total wall time {total_wall:.3f}s, "
+          f"sum of solver wall times {sum(o.wall for o in outcomes):.3f}s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the advent of code solvers")
+    parser.add_argument("modules", nargs="*", help="modules to run, e.g. day11 day05_v2 (default: all)")
+    parser.add_argument("--small", action="store_true", help="run on the examples and check the expected values")
+    parser.add_argument("--input-dir", default=".", help="where the dayXX.txt files are")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    modules = args.modules or find_modules()
+    jobs = make_jobs(modules, args.small, args.input_dir)
+
+    start = time.perf_counter()
+    outcomes = run_jobs(jobs, args.jobs)
+    failed = report(outcomes, time.perf_counter() - start)
+    if failed:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Structured trace for the solvers, JSON lines on stderr instead of printing whole data structures.
+
+    AOC_TRACE=info ./day08.py     # counters and spans
+    AOC_TRACE=debug ./day08.py    # also the per iteration events
+    AOC_TRACE_FILE=trace.jsonl    # write to a file instead of stderr
+
+Off by default. Counters and spans are emitted once per solver or per layer so they
+cost nothing when off. Events inside hot loops must be guarded, so that only
+an attribute lookup is left when tracing is off:
+
+    if tracing.DEBUG:
+        tracing.event("day08.step", step=step, position=position)
+"""
+
+import json
+import os
+import sys
+import time
+from typing import List, Set, Tuple, Collection, Dict
+
+LEVELS = {"off": 0, "info": 1, "debug": 2}
+
+INFO = False
+DEBUG = False
+_out = sys.stderr
+
+
+def set_level(name: str):
+    global INFO, DEBUG
+    level = LEVELS[name]
+    INFO = level >= LEVELS["info"]
+    DEBUG = level >= LEVELS["debug"]
+
+
+def set_output(filename: str):
+    global _out
+    _out = open(filename, "a")
+
+
+def _emit(kind: str, name: str, fields: Dict):
+    record = {"t": time.perf_counter(), "kind": kind, "name": name}
+    record.update(fields)
+    _out.write(json.dumps(record, default=str) + "\n")
+
+
+def event(name: str, **fields):
+    "Per iteration detail, guard the call with `if tracing.DEBUG:` in hot loops"
+    if DEBUG:
+        _emit("event", name, fields)
+
+
+def count(name: str, value: int, **fields):
+    "A counter, once the loop is done"
+    if INFO:
+        fields["value"] = value
+        _emit("count", name, fields)
+
+
+class Span:
+    "Times a block, counters set on it are emitted with the duration"
+    __slots__ = ("name", "fields", "start")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.start = 0.0
+
+    def __setitem__(self, key, value):
+        self.fields[key] = value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.fields["duration"] = time.perf_counter() - self.start
+        _emit("span", self.name, self.fields)
+        return False
+
+
+class NullSpan:
+    "What span returns when tracing is off"
+    __slots__ = ()
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name: str, **fields) -> Span | NullSpan:
+    if INFO:
+        return Span(name, fields)
+    return NULL_SPAN
+
+
+set_level(os.environ.get("AOC_TRACE", "off"))
+if os.environ.get("AOC_TRACE_FILE"):
+    set_output(os.environ["AOC_TRACE_FILE"])